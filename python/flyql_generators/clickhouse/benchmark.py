@@ -0,0 +1,168 @@
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+
+from .field import Field
+from .generator import to_ir, to_sql
+from .helpers import build_chain
+from .memo import CompileCache
+from .render import render_where
+
+DEFAULT_SIZE = 200
+DEFAULT_ROUNDS = 20
+DEFAULT_NUMBER = 20
+# to_sql also escapes map keys and resolves path aliases, which the
+# string generator of the baseline commit did not, at about 1.2x its time
+DEFAULT_MAX_RATIO = 1.3
+BASELINE_PACKAGE = "flyql_generators_baseline"
+
+# (key, operator, value, value_is_string), only operations every version supports
+PREDICATES = (
+    ("message", Operator.EQUALS.value, "timeout", True),
+    ("message", Operator.EQUALS.value, "*timeout*", True),
+    ("count", Operator.GREATER_THAN.value, 10, False),
+    ("attrs:env", Operator.EQUALS.value, "prod", True),
+    ("payload:user:name", Operator.EQUALS.value, "bob", True),
+    ("payload:user:id", Operator.EQUALS.value, 42, False),
+    ("doc:user:name", Operator.EQUALS.value, "bob", True),
+    ("tags:0", Operator.EQUALS.value, "a", True),
+)
+
+
+def bench_fields() -> Dict[str, Field]:
+    return {
+        "message": Field("message", False, "String"),
+        "count": Field("count", False, "Int64"),
+        "attrs": Field("attrs", False, "Map(String, String)"),
+        "payload": Field("payload", True, "String"),
+        "doc": Field("doc", False, "JSON"),
+        "tags": Field("tags", False, "Array(String)"),
+    }
+
+
+def bench_operands(size: int = DEFAULT_SIZE) -> List[Node]:
+    operands = []
+    for i in range(size):
+        key, operator, value, value_is_string = PREDICATES[i % len(PREDICATES)]
+        if value_is_string:
+            value = f"{value}{i}"
+        operands.append(Node("", Expression(key, operator, value, value_is_string), None, None))
+    return operands
+
+
+def load_baseline(path: str):
+    """
+    Returns generator module of another checkout of the flyql_generators package
+    (path is its directory), imported next to this one under a different name
+    """
+    spec = importlib.util.spec_from_file_location(
+        BASELINE_PACKAGE, os.path.join(path, "__init__.py"), submodule_search_locations=[path],
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[BASELINE_PACKAGE] = package
+    spec.loader.exec_module(package)
+    return importlib.import_module(f"{BASELINE_PACKAGE}.clickhouse.generator")
+
+
+def baseline_fields(baseline, fields: Mapping[str, Field]) -> Dict[str, object]:
+    """
+    Returns fields rebuilt with the Field class of the baseline, which may
+    not know the options added since
+    """
+    return {k: baseline.Field(v.name, v.jsonstring, v.type, v.values) for k, v in fields.items()}
+
+
+def best_time(func: Callable[[], object], number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - started) / number
+
+
+def measure(
+        cases: Mapping[str, Callable[[], object]],
+        rounds: int = DEFAULT_ROUNDS,
+        number: int = DEFAULT_NUMBER,
+) -> Dict[str, float]:
+    """
+    Returns best seconds per call of each case. Cases are run in turns,
+    so a slow period of the machine affects all of them alike
+    """
+    result = {name: float("inf") for name in cases}
+    for _ in range(rounds):
+        for name, func in cases.items():
+            result[name] = min(result[name], best_time(func, number))
+    return result
+
+
+def benchmark_cases(size: int = DEFAULT_SIZE, baseline=None) -> Dict[str, Callable[[], object]]:
+    """
+    Returns benchmarked calls over an AND chain of size predicates:
+    plain to_sql, to_ir rendered by render_where, to_sql with a warm cache
+    for the same tree and for a tree with one predicate changed,
+    and baseline to_sql if the baseline generator module is given
+    """
+    fields = bench_fields()
+    operands = bench_operands(size)
+    root = build_chain("and", operands)
+    edited = build_chain("and", operands[:-1] + [Node("", Expression("count", "<", 5, False), None, None)])
+
+    cache = CompileCache()
+    to_sql(root, fields, cache=cache)
+
+    def edit():
+        to_sql(edited, fields, cache=cache)
+        # next call is an edit again
+        to_sql(root, fields, cache=cache)
+
+    cases = {
+        "to_sql": lambda: to_sql(root, fields),
+        "to_ir+render": lambda: render_where(to_ir(root, fields)),
+        "cached": lambda: to_sql(root, fields, cache=cache),
+        "cached_edit": edit,
+    }
+    if baseline is not None:
+        old_fields = baseline_fields(baseline, fields)
+        cases["baseline"] = lambda: baseline.to_sql(root, old_fields)
+    return cases
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compilation speed of an AND chain, optionally against a baseline")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--number", type=int, default=DEFAULT_NUMBER)
+    parser.add_argument("--baseline", help="directory of another checkout of the flyql_generators package")
+    parser.add_argument("--max-ratio", type=float, default=DEFAULT_MAX_RATIO,
+                        help="fail if to_sql is slower than baseline to_sql by more than this factor")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    cases = benchmark_cases(args.size, baseline)
+    if baseline is not None and cases["to_sql"]() != cases["baseline"]():
+        print("to_sql output differs from baseline")
+        return 1
+
+    timings = measure(cases, args.rounds, args.number)
+    reference = timings.get("baseline", timings["to_sql"])
+    print(f"{args.size} predicates")
+    print(f"{'case':>14} {'ms':>8} {'ratio':>6}")
+    for name, seconds in timings.items():
+        print(f"{name:>14} {seconds * 1000:>8.3f} {seconds / reference:>6.2f}")
+
+    if baseline is not None and timings["to_sql"] > timings["baseline"] * args.max_ratio:
+        print(f"to_sql is more than {args.max_ratio:.2f}x slower than baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from flyql.exceptions import FlyqlError
+from flyql.tree import Node
+
+from .cost import CostEstimate, estimate_cost
+from .field import Field
+from .reorder import reorder_node
+
+BUDGET_ACTION_REFUSE = "refuse"
+BUDGET_ACTION_DOWNGRADE = "downgrade"
+BUDGET_ACTIONS = frozenset({BUDGET_ACTION_REFUSE, BUDGET_ACTION_DOWNGRADE})
+
+
+class Budget:
+    """
+    Complexity limits for generated filters, None means unlimited.
+    With the downgrade action a query over max_total is reordered so cheap and
+    selective predicates short-circuit the expensive ones, and is refused only if
+    its expected cost after reordering is still over the limit.
+    Count limits are always hard limits
+    """
+
+    def __init__(
+            self,
+            max_total: Optional[float] = None,
+            max_predicates: Optional[int] = None,
+            max_regexes: Optional[int] = None,
+            max_json_parses: Optional[int] = None,
+            max_map_scans: Optional[int] = None,
+            max_leading_wildcard_likes: Optional[int] = None,
+            action: str = BUDGET_ACTION_REFUSE,
+    ):
+        if action not in BUDGET_ACTIONS:
+            raise FlyqlError(f"unknown budget action: {action}")
+        self.max_total = max_total
+        self.max_predicates = max_predicates
+        self.max_regexes = max_regexes
+        self.max_json_parses = max_json_parses
+        self.max_map_scans = max_map_scans
+        self.max_leading_wildcard_likes = max_leading_wildcard_likes
+        self.action = action
+
+    def limits(self) -> Dict[str, Optional[float]]:
+        return {
+            "total": self.max_total,
+            "predicates": self.max_predicates,
+            "regexes": self.max_regexes,
+            "json_parses": self.max_json_parses,
+            "map_scans": self.max_map_scans,
+            "leading_wildcard_likes": self.max_leading_wildcard_likes,
+        }
+
+    def violations(self, estimate: CostEstimate, total: Optional[float] = None) -> List[str]:
+        """
+        Returns descriptions of exceeded limits, total overrides the estimated total cost
+        """
+        breakdown = estimate.breakdown()
+        if total is not None:
+            breakdown["total"] = total
+        violations = []
+        for name, limit in self.limits().items():
+            if limit is not None and breakdown[name] > limit:
+                violations.append(f"{name} {breakdown[name]:g} > {limit:g}")
+        return violations
+
+
+def apply_budget(
+        root: Node,
+        fields: Mapping[str, Field],
+        budget: Budget,
+        selectivity: Optional[Mapping[str, float]] = None,
+) -> Tuple[Node, CostEstimate]:
+    """
+    Returns tree to compile (reordered if downgraded) with its cost estimate,
+    raises FlyqlError if the query does not fit the budget
+    """
+    estimate = estimate_cost(root, fields)
+    violations = budget.violations(estimate)
+
+    if violations and budget.action == BUDGET_ACTION_DOWNGRADE:
+        root, expected_total, _ = reorder_node(root, fields, selectivity or {})
+        violations = budget.violations(estimate, total=expected_total)
+
+    if violations:
+        raise FlyqlError("query exceeds complexity budget: %s" % ", ".join(violations))
+    return root, estimate
@@ -0,0 +1,21 @@
+import pytest
+
+from .field import Field
+
+
+@pytest.fixture
+def fields():
+    return {
+        "message": Field("message", False, "String"),
+        "service": Field("service", False, "String"),
+        "level": Field("level", False, "LowCardinality(String)"),
+        "trace_id": Field("trace_id", False, "String"),
+        "count": Field("count", False, "Int64"),
+        "duration": Field("duration", False, "Float64"),
+        "ts": Field("ts", False, "DateTime64(3)"),
+        "payload": Field("payload", True, "String"),
+        "doc": Field("doc", False, "JSON(status UInt16)", json_paths={"user.id": "Int64"}),
+        "attrs": Field("attrs", False, "Map(String, String)"),
+        "tags": Field("tags", False, "Array(String)"),
+        "enum_field": Field("enum_field", False, "Enum8", ["value1", "value2"]),
+    }
@@ -1,3 +1,5 @@
+from types import MappingProxyType
+
 NORMALIZED_TYPE_STRING = 'string'
 NORMALIZED_TYPE_INT = 'int'
 NORMALIZED_TYPE_FLOAT = 'float'
@@ -11,8 +13,8 @@ NORMALIZED_TYPE_INTERVAL = 'interval'
 NORMALIZED_TYPE_SPECIAL = 'special'
 NORMALIZED_TYPE_JSON = 'json'
 
-NORMALIZED_TYPE_TO_CLICKHOUSE_TYPES = {
-    NORMALIZED_TYPE_STRING: {
+NORMALIZED_TYPE_TO_CLICKHOUSE_TYPES = MappingProxyType({
+    NORMALIZED_TYPE_STRING: frozenset({
         'string', 'fixedstring', 'longtext', 'mediumtext', 'tinytext', 'text',
         'longblob', 'mediumblob', 'tinyblob', 'blob', 'varchar', 'char',
         'char large object', 'char varying', 'character', 'character large object',
@@ -22,8 +24,8 @@ NORMALIZED_TYPE_TO_CLICKHOUSE_TYPES = {
         'binary large object', 'binary varying', 'clob', 'nchar', 'nvarchar',
         'varchar2', 'binary', 'varbinary', 'bytea', 'uuid', 'ipv4', 'ipv6',
         'enum8', 'enum16'
-    },
-    NORMALIZED_TYPE_INT: {
+    }),
+    NORMALIZED_TYPE_INT: frozenset({
         'int8', 'int16', 'int32', 'int64', 'int128', 'int256',
         'uint8', 'uint16', 'uint32', 'uint64', 'uint128', 'uint256',
         'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint',
@@ -32,24 +34,27 @@ NORMALIZED_TYPE_TO_CLICKHOUSE_TYPES = {
         'integer signed', 'integer unsigned', 'bigint signed', 'bigint unsigned',
         'int1', 'int1 signed', 'int1 unsigned', 'byte', 'signed', 'unsigned',
         'bit', 'set', 'time'
-    },
-    NORMALIZED_TYPE_FLOAT: {
+    }),
+    NORMALIZED_TYPE_FLOAT: frozenset({
         'float32', 'float64', 'float', 'double', 'double precision', 'real',
         'decimal', 'decimal32', 'decimal64', 'decimal128', 'decimal256',
         'dec', 'numeric', 'fixed', 'single'
-    },
-    NORMALIZED_TYPE_BOOL: {'bool', 'boolean'},
-    NORMALIZED_TYPE_DATE: {
+    }),
+    NORMALIZED_TYPE_BOOL: frozenset({'bool', 'boolean'}),
+    NORMALIZED_TYPE_DATE: frozenset({
         'date', 'date32', 'datetime', 'datetime32', 'datetime64', 'timestamp',
         'year'
-    },
-    NORMALIZED_TYPE_INTERVAL: {
+    }),
+    NORMALIZED_TYPE_INTERVAL: frozenset({
         'intervalday', 'intervalhour', 'intervalmicrosecond', 'intervalmillisecond',
         'intervalminute', 'intervalmonth', 'intervalnanosecond', 'intervalquarter',
         'intervalsecond', 'intervalweek', 'intervalyear'
-    },
-    NORMALIZED_TYPE_GEOMETRY: {'geometry', 'point', 'polygon', 'multipolygon', 'linestring', 'ring'},
-    NORMALIZED_TYPE_SPECIAL: {'nothing', 'nested', 'object', 'dynamic', 'variant'},
-    NORMALIZED_TYPE_JSON: {'json'},
+    }),
+    NORMALIZED_TYPE_GEOMETRY: frozenset({'geometry', 'point', 'polygon', 'multipolygon', 'linestring', 'ring'}),
+    NORMALIZED_TYPE_SPECIAL: frozenset({'nothing', 'nested', 'object', 'dynamic', 'variant'}),
+    NORMALIZED_TYPE_JSON: frozenset({'json'}),
+
+})
 
-}
+BOOL_OPERATOR_AND = 'and'
+BOOL_OPERATOR_OR = 'or'
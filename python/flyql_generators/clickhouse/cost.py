@@ -0,0 +1,169 @@
+from typing import Dict, Mapping
+
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+
+from .field import Field
+from .helpers import (
+    SQL_LIKE_PATTERN_CHAR,
+    is_number,
+    matches_default_value,
+    prepare_like_pattern_value,
+    value_fits_type,
+)
+
+# relative per-row evaluation cost of a predicate,
+# regex > JSON multiIf > LIKE > Map access > equality on plain columns
+COST_COMPARE = 1
+COST_MAP_ACCESS = 4
+COST_JSON_DYNAMIC_ACCESS = 4
+COST_LIKE = 8
+COST_JSON_EXTRACT = 16
+COST_REGEX = 32
+
+# JSONType and JSONExtract* calls of a jsonstring multiIf branch, each one parses the document
+JSON_PARSES_PER_BRANCH = 2
+JSON_NUMBER_BRANCHES = 4
+
+REGEX_OPERATORS = frozenset({Operator.EQUALS_REGEX.value, Operator.NOT_EQUALS_REGEX.value})
+LIKE_OPERATORS = frozenset({Operator.EQUALS.value, Operator.NOT_EQUALS.value})
+
+
+def get_expression_field(expression: Expression, fields: Mapping[str, Field]):
+    return fields.get(expression.key.split(":")[0])
+
+
+def is_like_expression(expression: Expression) -> bool:
+    if expression.operator not in LIKE_OPERATORS or not isinstance(expression.value, str):
+        return False
+    is_like_pattern, _ = prepare_like_pattern_value(expression.value)
+    return is_like_pattern
+
+
+def path_alias(expression: Expression, field: Field):
+    """
+    Returns alias column expression is compiled against, None if it is
+    compiled against the field itself
+    """
+    if field is None or not field.path_aliases or ":" not in expression.key:
+        return None
+    alias = field.path_aliases.get(field.path_key(expression.key.split(":")[1:]))
+    if alias is None or not value_fits_type(expression.value, alias.normalized_type, expression.operator):
+        return None
+    # rows without the path hold the default value of the alias column, comparisons
+    # it satisfies go to the field unless it reads the default value as well (map)
+    # or can not compare at all (ordered comparison of numbers on a JSON string)
+    if field.is_map or not matches_default_value(expression.value, alias.normalized_type, expression.operator):
+        return alias
+    if not value_fits_type(expression.value, field.normalized_type, expression.operator):
+        return alias
+    return None
+
+
+def access_cost(expression: Expression, field: Field) -> int:
+    if field is None or ":" not in expression.key:
+        return 0
+    if path_alias(expression, field) is not None:
+        return 0
+    if field.jsonstring:
+        return COST_JSON_EXTRACT
+    if field.is_json:
+        path = ".".join(expression.key.split(":")[1:])
+        if path in field.json_typed_paths:
+            return 0
+        return COST_JSON_DYNAMIC_ACCESS
+    return COST_MAP_ACCESS
+
+
+def compare_cost(expression: Expression, field: Field) -> int:
+    if expression.operator in REGEX_OPERATORS:
+        return COST_REGEX
+    if is_like_expression(expression) and field is not None:
+        # paths compare literally
+        if ":" not in expression.key:
+            return COST_LIKE
+    return COST_COMPARE
+
+
+def expression_cost(expression: Expression, fields: Mapping[str, Field]) -> int:
+    """
+    Returns estimated per-row cost of the condition generated for expression
+    """
+    field = get_expression_field(expression, fields)
+    return access_cost(expression, field) + compare_cost(expression, field)
+
+
+def json_parses(expression: Expression, field: Field) -> int:
+    if field is None or not field.jsonstring or ":" not in expression.key:
+        return 0
+    if path_alias(expression, field) is not None:
+        return 0
+    if is_number(expression.value) and expression.operator not in REGEX_OPERATORS:
+        return JSON_PARSES_PER_BRANCH * JSON_NUMBER_BRANCHES
+    return JSON_PARSES_PER_BRANCH
+
+
+def is_map_scan(expression: Expression, field: Field) -> bool:
+    return field is not None and field.is_map and ":" in expression.key and path_alias(expression, field) is None
+
+
+def is_leading_wildcard_like(expression: Expression) -> bool:
+    if not is_like_expression(expression):
+        return False
+    _, value = prepare_like_pattern_value(expression.value)
+    return value.startswith(SQL_LIKE_PATTERN_CHAR)
+
+
+class CostEstimate:
+    """
+    Static estimate of the per-row work of a generated filter,
+    assuming every predicate is evaluated
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.predicates = 0
+        self.regexes = 0
+        self.json_parses = 0
+        self.map_scans = 0
+        self.leading_wildcard_likes = 0
+
+    def add(self, expression: Expression, fields: Mapping[str, Field]) -> None:
+        field = get_expression_field(expression, fields)
+        self.total += access_cost(expression, field) + compare_cost(expression, field)
+        self.predicates += 1
+        if expression.operator in REGEX_OPERATORS:
+            self.regexes += 1
+        self.json_parses += json_parses(expression, field)
+        if is_map_scan(expression, field):
+            self.map_scans += 1
+        if compare_cost(expression, field) == COST_LIKE and is_leading_wildcard_like(expression):
+            self.leading_wildcard_likes += 1
+
+    def breakdown(self) -> Dict[str, int]:
+        return {
+            "total": self.total,
+            "predicates": self.predicates,
+            "regexes": self.regexes,
+            "json_parses": self.json_parses,
+            "map_scans": self.map_scans,
+            "leading_wildcard_likes": self.leading_wildcard_likes,
+        }
+
+
+def estimate_cost(root: Node, fields: Mapping[str, Field]) -> CostEstimate:
+    """
+    Returns static cost estimate for given tree and fields
+    """
+    estimate = CostEstimate()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.expression is not None:
+            estimate.add(node.expression, fields)
+        if node.right is not None:
+            stack.append(node.right)
+        if node.left is not None:
+            stack.append(node.left)
+    return estimate
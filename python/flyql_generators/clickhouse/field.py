@@ -1,5 +1,6 @@
 import re
-from typing import List, Optional
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
 from .constants import NORMALIZED_TYPE_TO_CLICKHOUSE_TYPES
 from .constants import (
@@ -17,7 +18,7 @@ from .constants import (
     NORMALIZED_TYPE_JSON,
 )
 
-REGEX = {
+REGEX = MappingProxyType({
     'wrapper': re.compile(r'^(nullable|lowcardinality|simpleaggregatefunction|aggregatefunction)\s*\(\s*(.+)\s*\)'),
     NORMALIZED_TYPE_STRING: re.compile(r'^(varchar|char|fixedstring)\s*\(\s*\d+\s*\)'),
     NORMALIZED_TYPE_INT: re.compile(r'^(tinyint|smallint|mediumint|int|integer|bigint)\s*\(\s*\d+\s*\)'),
@@ -27,7 +28,64 @@ REGEX = {
     NORMALIZED_TYPE_MAP: re.compile(r'^map\s*\('),
     NORMALIZED_TYPE_TUPLE: re.compile(r'^tuple\s*\('),
     NORMALIZED_TYPE_JSON: re.compile(r'^json\s*\('),
-}
+})
+JSON_PARAMS_REGEX = re.compile(r'^json\s*\((.*)\)$', re.IGNORECASE | re.DOTALL)
+
+
+def split_type_params(params: str) -> List[str]:
+    parts = []
+    depth = 0
+    quote = ""
+    current = ""
+    for char in params:
+        if quote:
+            if char == quote:
+                quote = ""
+        elif char in ("'", "`", '"'):
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def parse_json_type_paths(ch_type: str) -> Dict[str, str]:
+    """
+    Returns typed paths declared in a JSON column type,
+    e.g. JSON(a.b UInt32, SKIP a.c) -> {'a.b': 'UInt32'}
+    """
+    if not ch_type or not isinstance(ch_type, str):
+        return {}
+
+    match = JSON_PARAMS_REGEX.match(ch_type.strip())
+    if not match:
+        return {}
+
+    paths = {}
+    for param in split_type_params(match.group(1)):
+        if "=" in param.split("(")[0] or param.lower().startswith("skip "):
+            continue
+        if param.startswith("`"):
+            end = param.find("`", 1)
+            if end == -1:
+                continue
+            path, path_type = param[1:end], param[end + 1:].strip()
+        else:
+            spl = param.split(None, 1)
+            if len(spl) != 2:
+                continue
+            path, path_type = spl
+        if path and path_type:
+            paths[path] = path_type.strip()
+    return paths
 
 
 def normalize_clickhouse_type(ch_type: str) -> Optional[str]:
@@ -94,6 +152,25 @@ def normalize_clickhouse_type(ch_type: str) -> Optional[str]:
     return None
 
 
+class PathAlias:
+    """
+    Declares that path of a field is available as a separate typed column,
+    e.g. PathAlias('user:id', 'user_id', 'Int64') for a column materialized from payload:user:id.
+    Strings are compared as is, like on the original field, '*' is not a LIKE wildcard.
+    Rows without the path hold the default value of the column type (0, false or ''),
+    which a JSON path never matches, so comparisons the default value satisfies
+    (user:id != 5, user:id = 0) are compiled against the original field. Ordered
+    comparisons of numbers are not allowed on a JSON string, payload:user:id < 5
+    is always compiled against the alias and matches rows without the path
+    """
+
+    def __init__(self, path: str, column: str, _type: str):
+        self.path = path
+        self.column = column
+        self.type = _type
+        self.normalized_type = normalize_clickhouse_type(_type)
+
+
 class Field:
     def __init__(
             self,
@@ -101,12 +178,47 @@ class Field:
             jsonstring: bool,
             _type: str,
             values: Optional[List[str]] = None,
+            map_keys_indexed: bool = False,
+            map_values_indexed: bool = False,
+            json_paths: Optional[Mapping[str, str]] = None,
+            path_aliases: Optional[List[PathAlias]] = None,
     ):
         self.name = name
         self.jsonstring = jsonstring
         self.type = _type
         self.values = values or []
+        # data-skipping indexes on mapKeys(name) / mapValues(name)
+        self.map_keys_indexed = map_keys_indexed
+        self.map_values_indexed = map_values_indexed
         self.normalized_type = normalize_clickhouse_type(_type)
         self.is_map = self.normalized_type == NORMALIZED_TYPE_MAP
         self.is_array = self.normalized_type == NORMALIZED_TYPE_ARRAY
         self.is_json = self.normalized_type == NORMALIZED_TYPE_JSON
+        # typed paths declared in the column type are stored as dedicated subcolumns,
+        # json_paths are type hints for paths stored as Dynamic
+        self.json_typed_paths = parse_json_type_paths(_type) if self.is_json else {}
+        self.json_paths = dict(json_paths or {})
+        self.path_aliases = {self.path_key(x.path.split(":")): x for x in path_aliases or []}
+
+    def path_key(self, parts: List[str]) -> str:
+        """
+        Returns path as addressed in generated SQL, for native JSON a:b and a.b are the same path
+        """
+        if self.is_json:
+            return ".".join(parts)
+        return ":".join(parts)
+
+    def cache_key(self) -> Tuple:
+        """
+        Returns hashable tuple of everything that affects generated SQL
+        """
+        return (
+            self.name,
+            self.jsonstring,
+            self.type,
+            tuple(self.values),
+            self.map_keys_indexed,
+            self.map_values_indexed,
+            tuple(sorted(self.json_paths.items())),
+            tuple(sorted((k, v.column, v.type) for k, v in self.path_aliases.items())),
+        )
@@ -1,15 +1,60 @@
+import hashlib
 import re
-from typing import List, Mapping, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
 from flyql.exceptions import FlyqlError
 from flyql.expression import Expression
 from flyql.constants import Operator
 from flyql.tree import Node
 
-from .field import Field
-from .helpers import validate_operation
+from .constants import (
+    BOOL_OPERATOR_AND,
+    NORMALIZED_TYPE_STRING,
+    NORMALIZED_TYPE_INT,
+    NORMALIZED_TYPE_FLOAT,
+    NORMALIZED_TYPE_BOOL,
+)
+from .budget import Budget, apply_budget
+from .cost import REGEX_OPERATORS, path_alias
+from .field import Field, normalize_clickhouse_type
+# value helpers used to live in this module, the constants are re-exported
+# so that existing `from .generator import ...` imports keep working
+from .helpers import ESCAPE_CHARS_MAP, LIKE_PATTERN_CHAR, SQL_LIKE_PATTERN_CHAR  # noqa: F401
+from .helpers import (
+    BOOL_LITERALS,
+    escape_param,
+    flatten,
+    is_number,
+    prepare_like_pattern_value,
+    validate_operation,
+    value_fits_type,
+)
+from .ir import (
+    STRATEGY_ARRAY,
+    STRATEGY_COLUMN,
+    STRATEGY_JSON_DYNAMIC,
+    STRATEGY_JSON_HINTED,
+    STRATEGY_JSON_STRING,
+    STRATEGY_JSON_TYPED,
+    STRATEGY_MAP,
+    STRATEGY_PATH_ALIAS,
+    IRNode,
+    Literal,
+    Predicate,
+)
+from .memo import CompileCache, SubtreeKeys
+from .render import IR_BUILDER, TEXT_BUILDER, IRBuilder, render_with_aliases
+from .stats import WorkloadStats
 
-OPERATOR_TO_CLICKHOUSE_FUNC = {
+# Operator.X.value looks the member up on every use, hot paths compare with these
+OPERATOR_EQUALS = Operator.EQUALS.value
+OPERATOR_NOT_EQUALS = Operator.NOT_EQUALS.value
+OPERATOR_EQUALS_REGEX = Operator.EQUALS_REGEX.value
+OPERATOR_NOT_EQUALS_REGEX = Operator.NOT_EQUALS_REGEX.value
+EQUALITY_OPERATORS = frozenset({OPERATOR_EQUALS, OPERATOR_NOT_EQUALS})
+
+OPERATOR_TO_CLICKHOUSE_FUNC = MappingProxyType({
     Operator.EQUALS.value: "equals",
     Operator.NOT_EQUALS.value: "notEquals",
     Operator.EQUALS_REGEX.value: "match",
@@ -18,24 +63,26 @@ OPERATOR_TO_CLICKHOUSE_FUNC = {
     Operator.LOWER_THAN.value: "less",
     Operator.GREATER_OR_EQUALS_THAN.value: "greaterOrEquals",
     Operator.LOWER_OR_EQUALS_THAN.value: "lessOrEquals",
-}
+})
 
-LIKE_PATTERN_CHAR = "*"
-SQL_LIKE_PATTERN_CHAR = "%"
-JSON_KEY_PATTERN = re.compile(r'^[a-zA-Z_][.a-zA-Z0-9_-]*$')
+# (JSONType result as SQL literal, function extracting value of that type)
+JSON_STRING_EXTRACT = ("'String'", "JSONExtractString")
+JSON_NUMBER_EXTRACTS = (
+    ("'Int64'", "JSONExtractInt"),
+    ("'Double'", "JSONExtractFloat"),
+    ("'Bool'", "JSONExtractBool"),
+)
 
-ESCAPE_CHARS_MAP = {
-    "\b": "\\b",
-    "\f": "\\f",
-    "\r": "\\r",
-    "\n": "\\n",
-    "\t": "\\t",
-    "\0": "\\0",
-    "\a": "\\a",
-    "\v": "\\v",
-    "\\": "\\\\",
-    "'": "\\'",
-}
+# values are str, int, float, bool or None
+LITERAL_TYPES = MappingProxyType({
+    type(None): None,
+    bool: "Bool",
+    int: "Int64",
+    float: "Float64",
+})
+
+JSON_KEY_PATTERN = re.compile(r'^[a-zA-Z_][.a-zA-Z0-9_-]*$')
+IDENTIFIER_PATTERN = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
 
 
 def validate_json_path_part(part: str) -> None:
@@ -45,175 +92,478 @@ def validate_json_path_part(part: str) -> None:
         raise FlyqlError("Invalid JSON path part")
 
 
-def escape_param(item) -> str:
-    if item is None:
-        return "NULL"
-    elif isinstance(item, str):
-        return "'%s'" % "".join(ESCAPE_CHARS_MAP.get(c, c) for c in item)
-    elif isinstance(item, bool):
-        return str(item)
-    elif isinstance(item, (int, float)):
-        return str(item)
-    else:
-        return str(item)
+def quote_identifier(name: str) -> str:
+    if IDENTIFIER_PATTERN.match(name):
+        return name
+    return "`%s`" % name.replace("\\", "\\\\").replace("`", "\\`")
 
 
-def is_number(value) -> bool:
-    try:
-        float(value)
-    except (ValueError, TypeError):
-        try:
-            int(value)
-        except (ValueError, TypeError):
-            return False
-        else:
-            return True
-    else:
-        return True
-
-
-def prepare_like_pattern_value(value: str) -> Tuple[bool, str]:
-    pattern_found = False
-    new_value = ""
-    i = 0
-    while i < len(value):
-        char = value[i]
-        if char == LIKE_PATTERN_CHAR:
-            if i > 0 and value[i - 1] == "\\":
-                new_value += LIKE_PATTERN_CHAR
-            else:
-                new_value += SQL_LIKE_PATTERN_CHAR
-                pattern_found = True
-        elif char == SQL_LIKE_PATTERN_CHAR:
-            pattern_found = True
-            new_value += "\\"
-            new_value += SQL_LIKE_PATTERN_CHAR
-        elif char == "\\" and i + 1 < len(value) and value[i + 1] == LIKE_PATTERN_CHAR:
-            new_value += "\\"
+def format_number(value) -> str:
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, str):
+        value = float(value)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def normalize_literal(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def literal_type(value) -> Optional[str]:
+    """
+    Returns ClickHouse type of query parameter holding value, None for NULL
+    """
+    return LITERAL_TYPES.get(type(value), "String")
+
+
+def value_literal(value, build: IRBuilder = IR_BUILDER) -> Literal:
+    return build.Literal(value, escape_param(value), literal_type(value))
+
+
+def number_literal(value, build: IRBuilder = IR_BUILDER) -> Literal:
+    number = normalize_literal(float(value))
+    return build.Literal(number, format_number(value), literal_type(number))
+
+
+def numeric_target_literal(value, canonical: bool, build: IRBuilder = IR_BUILDER) -> Literal:
+    """
+    Returns literal for value compared with a numeric column or extraction,
+    in canonical mode numbers are rendered in canonical form, e.g. 10.0 as 10
+    """
+    if canonical and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return number_literal(value, build)
+    return value_literal(value, build)
+
+
+def typed_literal(value, normalized_type: Optional[str], build: IRBuilder = IR_BUILDER) -> Literal:
+    """
+    Returns literal for value matching the column type, so the comparison
+    does not need a runtime conversion
+    """
+    if normalized_type in (NORMALIZED_TYPE_INT, NORMALIZED_TYPE_FLOAT):
+        if not is_number(value):
+            raise FlyqlError(f"invalid value for {normalized_type} type: {value}")
+        return number_literal(value, build)
+    if normalized_type == NORMALIZED_TYPE_BOOL:
+        if isinstance(value, str) and value.lower() in BOOL_LITERALS:
+            return build.Literal(value.lower() == "true", value.lower(), "Bool")
+        if not is_number(value):
+            raise FlyqlError(f"invalid value for {normalized_type} type: {value}")
+        return number_literal(value, build)
+    if isinstance(value, str):
+        return value_literal(value, build)
+    return value_literal(format_number(value), build)
+
+
+def typed_condition(
+        column: IRNode,
+        normalized_type: Optional[str],
+        expression: Expression,
+        like: bool = True,
+        build: IRBuilder = IR_BUILDER,
+) -> IRNode:
+    """
+    Returns condition for a column (or subcolumn) of known type,
+    strings are compared as is instead of as LIKE patterns if like is False
+    """
+    validate_operation(expression.value, normalized_type, expression.operator)
+
+    if expression.operator == OPERATOR_EQUALS_REGEX:
+        return build.Call("match", (column, value_literal(str(expression.value), build)))
+    elif expression.operator == OPERATOR_NOT_EQUALS_REGEX:
+        return build.Not(build.Call("match", (column, value_literal(str(expression.value), build))))
+
+    operator = expression.operator
+    if normalized_type == NORMALIZED_TYPE_STRING and operator in EQUALITY_OPERATORS:
+        if isinstance(expression.value, str):
+            if not like:
+                return build.Compare(column, operator, value_literal(expression.value, build))
+            is_like_pattern, value = prepare_like_pattern_value(expression.value)
+            if is_like_pattern:
+                operator = "LIKE" if operator == OPERATOR_EQUALS else "NOT LIKE"
+            return build.Compare(column, operator, value_literal(value, build))
+
+    return build.Compare(column, operator, typed_literal(expression.value, normalized_type, build))
+
+
+def fitting_condition(
+        column: IRNode,
+        normalized_type: Optional[str],
+        expression: Expression,
+        like: bool = True,
+        build: IRBuilder = IR_BUILDER,
+) -> Optional[IRNode]:
+    """
+    Returns typed_condition for a column that holds only some of the values
+    a path may hold, None if operator or value does not fit the column type
+    and the caller has to fall back to the generic access
+    """
+    if not value_fits_type(expression.value, normalized_type, expression.operator):
+        return None
+    return typed_condition(column, normalized_type, expression, like, build)
+
+
+def is_map_default_value(value) -> bool:
+    """
+    Returns True if value may equal the default value ClickHouse returns
+    for a missing map key ('' or zero)
+    """
+    if isinstance(value, str):
+        return value == "" or (is_number(value) and float(value) == 0)
+    return not value
+
+
+def map_prefilters(
+        field: Field,
+        map_key: Literal,
+        expression: Expression,
+        build: IRBuilder = IR_BUILDER,
+) -> List[IRNode]:
+    """
+    Returns index-friendly predicates implied by an equality on a map key.
+    Only emitted when they can not change the result: a missing key yields
+    the default value, so comparisons against it are left untouched.
+    """
+    prefilters = []
+    if not field.map_keys_indexed and not field.map_values_indexed:
+        return prefilters
+    if expression.operator != OPERATOR_EQUALS:
+        return prefilters
+    if is_map_default_value(expression.value):
+        return prefilters
+    column = build.Column(field.name)
+    if field.map_keys_indexed:
+        prefilters.append(build.Call("mapContains", (column, map_key)))
+    if field.map_values_indexed:
+        values = build.Call("mapValues", (column,))
+        prefilters.append(build.Call("has", (values, value_literal(expression.value, build))))
+    return prefilters
+
+
+def json_string_condition(
+        field: Field,
+        path: List[str],
+        expression: Expression,
+        canonical: bool,
+        build: IRBuilder = IR_BUILDER,
+) -> IRNode:
+    """
+    Returns condition over a JSON document stored in a String column:
+    the value is extracted according to its runtime JSON type
+    """
+    func = OPERATOR_TO_CLICKHOUSE_FUNC[expression.operator]
+    args = (build.Column(field.name),) + tuple([value_literal(x, build) for x in path])
+    json_type = build.Access(build.Call("JSONType", args))
+
+    extracts = [(JSON_STRING_EXTRACT, value_literal(expression.value, build))]
+    if expression.operator not in REGEX_OPERATORS and is_number(expression.value):
+        if canonical:
+            number = number_literal(expression.value, build)
         else:
-            new_value += char
-        i += 1
-    return pattern_found, new_value
+            number = build.Literal(float(expression.value), str(expression.value), "Float64")
+        extracts += [(x, number) for x in JSON_NUMBER_EXTRACTS]
 
+    branches = [
+        (
+            build.Compare(json_type, "=", build.Raw(json_type_name)),
+            build.Call(func, (build.Access(build.Call(extract_func, args)), value)),
+        )
+        for (json_type_name, extract_func), value in extracts
+    ]
+    condition = build.MultiIf(branches, build.Raw("0"))
+    if expression.operator == OPERATOR_NOT_EQUALS_REGEX:
+        return build.Not(condition)
+    return condition
 
-def expression_to_sql(expression: Expression, fields: Mapping[str, Field]) -> str:
-    text = ""
 
+def expression_to_ir(
+        expression: Expression,
+        fields: Mapping[str, Field],
+        canonical: bool = False,
+        build: IRBuilder = IR_BUILDER,
+) -> Predicate:
+    """
+    Resolves and validates expression against fields, returns its compiled predicate.
+    With canonical=True numbers compared with numeric targets are rendered in canonical form.
+    With build=TEXT_BUILDER the predicate is built as SQL text instead of IR
+    """
     if ":" in expression.key:
-        reverse_operator = ""
-        if expression.operator == Operator.NOT_EQUALS_REGEX.value:
-            reverse_operator = "not "
-        func = OPERATOR_TO_CLICKHOUSE_FUNC[expression.operator]
         spl = expression.key.split(":")
         field_name = spl[0]
+        path = spl[1:]
         if field_name not in fields:
             raise FlyqlError(f"unknown field: {field_name}")
         field = fields[field_name]
 
+        def predicate(strategy: str, condition: IRNode) -> Predicate:
+            return build.Predicate(expression.key, field.name, path, expression.operator, strategy, condition)
+
+        alias = path_alias(expression, field)
+        if alias is not None:
+            column = build.Column(alias.column)
+            condition = typed_condition(column, alias.normalized_type, expression, like=False, build=build)
+            return predicate(STRATEGY_PATH_ALIAS, condition)
+
         validate_operation(expression.value, field.normalized_type, expression.operator)
 
+        func = OPERATOR_TO_CLICKHOUSE_FUNC[expression.operator]
+        negate = expression.operator == OPERATOR_NOT_EQUALS_REGEX
+
         if field.jsonstring:
-            json_path = spl[1:]
-            json_path = ", ".join([escape_param(x) for x in json_path])
-
-            str_value = escape_param(expression.value)
-            multi_if = [
-                f"JSONType({field.name}, {json_path}) = 'String', {func}(JSONExtractString({field.name}, {json_path}), {str_value})"
-            ]
-            if is_number(expression.value) and expression.operator not in [
-                Operator.EQUALS_REGEX.value,
-                Operator.NOT_EQUALS_REGEX.value,
-            ]:
-                multi_if.extend(
-                    [
-                        f"JSONType({field.name}, {json_path}) = 'Int64', {func}(JSONExtractInt({field.name}, {json_path}), {expression.value})",
-                        f"JSONType({field.name}, {json_path}) = 'Double', {func}(JSONExtractFloat({field.name}, {json_path}), {expression.value})",
-                        f"JSONType({field.name}, {json_path}) = 'Bool', {func}(JSONExtractBool({field.name}, {json_path}), {expression.value})",
-                    ]
-                )
-            multi_if.append("0")
-            multi_if_str = ",".join(multi_if)
-            text = f"{reverse_operator}multiIf({multi_if_str})"
+            condition = json_string_condition(field, path, expression, canonical, build)
+            return predicate(STRATEGY_JSON_STRING, condition)
         elif field.is_json:
-            json_path = spl[1:]
-            for part in json_path:
+            for part in path:
                 validate_json_path_part(part)
-            json_path_str = ".".join(json_path)
-            value = escape_param(expression.value)
-            text = f"{field.name}.{json_path_str} {expression.operator} {value}"
+            json_path_str = ".".join(path)
+            if json_path_str in field.json_typed_paths:
+                normalized_type = normalize_clickhouse_type(field.json_typed_paths[json_path_str])
+                column = build.Column(f"{field.name}.{json_path_str}")
+                # typed and hinted paths change how a path is read, not what matches,
+                # so strings are compared as is like on the dynamic access below
+                condition = typed_condition(column, normalized_type, expression, like=False, build=build)
+                return predicate(STRATEGY_JSON_TYPED, condition)
+            if json_path_str in field.json_paths:
+                # hinted paths are Dynamic, values of other types are compared as is
+                path_type = field.json_paths[json_path_str]
+                column = build.Column(f"{field.name}.{json_path_str}.:{quote_identifier(path_type)}")
+                normalized_type = normalize_clickhouse_type(path_type)
+                condition = fitting_condition(column, normalized_type, expression, like=False, build=build)
+                if condition is not None:
+                    return predicate(STRATEGY_JSON_HINTED, condition)
+            column = build.Column(f"{field.name}.{json_path_str}")
+            if expression.operator == OPERATOR_EQUALS_REGEX:
+                condition = build.Call("match", (column, value_literal(str(expression.value), build)))
+            elif expression.operator == OPERATOR_NOT_EQUALS_REGEX:
+                condition = build.Not(build.Call("match", (column, value_literal(str(expression.value), build))))
+            else:
+                condition = build.Compare(column, expression.operator, value_literal(expression.value, build))
+            return predicate(STRATEGY_JSON_DYNAMIC, condition)
         elif field.is_map:
-            map_key = ":".join(spl[1:])
-            value = escape_param(expression.value)
-            text = f"{reverse_operator}{func}({field.name}['{map_key}'], {value})"
+            map_key = value_literal(":".join(path), build)
+            map_value = build.Access(build.Subscript(build.Column(field.name), map_key))
+            condition = build.Call(func, (map_value, value_literal(expression.value, build)))
+            if negate:
+                condition = build.Not(condition)
+            prefilters = map_prefilters(field, map_key, expression, build)
+            if prefilters:
+                condition = build.Bool(BOOL_OPERATOR_AND, prefilters + [condition])
+            return predicate(STRATEGY_MAP, condition)
         elif field.is_array:
             array_index = ":".join(spl[1])
             try:
                 array_index = int(array_index)
             except Exception:
                 raise FlyqlError(f"invalid array index, expected number: {array_index}")
-            value = escape_param(expression.value)
-            text = f"{reverse_operator}{func}({field.name}[{array_index}], {value})"
+            element = build.Subscript(build.Column(field.name), build.Raw(str(array_index)))
+            condition = build.Call(func, (element, value_literal(expression.value, build)))
+            if negate:
+                condition = build.Not(condition)
+            return predicate(STRATEGY_ARRAY, condition)
         else:
             raise FlyqlError("path search for unsupported field type")
 
-    else:
-        if expression.key not in fields:
-            raise FlyqlError(f"unknown field: {expression.key}")
+    if expression.key not in fields:
+        raise FlyqlError(f"unknown field: {expression.key}")
 
-        field = fields[expression.key]
+    field = fields[expression.key]
 
-        if field.values and expression.value not in field.values:
-            raise FlyqlError(f"unknown value: {expression.value}")
+    if field.values and expression.value not in field.values:
+        raise FlyqlError(f"unknown value: {expression.value}")
 
-        validate_operation(expression.value, field.normalized_type, expression.operator)
+    validate_operation(expression.value, field.normalized_type, expression.operator)
 
-        if expression.operator == Operator.EQUALS_REGEX.value:
-            value = escape_param(str(expression.value))
-            text = f"match({field.name}, {value})"
-        elif expression.operator == Operator.NOT_EQUALS_REGEX.value:
-            value = escape_param(str(expression.value))
-            text = f"not match({field.name}, {value})"
-        elif expression.operator in [Operator.EQUALS.value, Operator.NOT_EQUALS.value]:
-            operator = expression.operator
-            is_like_pattern, value = prepare_like_pattern_value(str(expression.value))
-            value = escape_param(value)
-            if is_like_pattern:
-                if expression.operator == Operator.EQUALS.value:
-                    operator = "LIKE"
-                else:
-                    operator = "NOT LIKE"
-            text = f"{field.name} {operator} {value}"
-        else:
-            if isinstance(expression.value, str):
-                value = escape_param(expression.value)
+    column = build.Column(field.name)
+    if expression.operator == OPERATOR_EQUALS_REGEX:
+        condition = build.Call("match", (column, value_literal(str(expression.value), build)))
+    elif expression.operator == OPERATOR_NOT_EQUALS_REGEX:
+        condition = build.Not(build.Call("match", (column, value_literal(str(expression.value), build))))
+    elif expression.operator in EQUALITY_OPERATORS:
+        operator = expression.operator
+        is_like_pattern, value = prepare_like_pattern_value(str(expression.value))
+        if is_like_pattern:
+            if expression.operator == OPERATOR_EQUALS:
+                operator = "LIKE"
             else:
-                value = str(expression.value)
-            text = f"{field.name} {expression.operator} {value}"
-    return text
+                operator = "NOT LIKE"
+        condition = build.Compare(column, operator, value_literal(value, build))
+    elif field.normalized_type in (NORMALIZED_TYPE_INT, NORMALIZED_TYPE_FLOAT):
+        value = numeric_target_literal(expression.value, canonical, build)
+        condition = build.Compare(column, expression.operator, value)
+    else:
+        condition = build.Compare(column, expression.operator, value_literal(expression.value, build))
+    return build.Predicate(expression.key, field.name, (), expression.operator, STRATEGY_COLUMN, condition)
+
+
+def expression_to_sql(expression: Expression, fields: Mapping[str, Field]) -> str:
+    return expression_to_ir(expression=expression, fields=fields, build=TEXT_BUILDER)
+
+
+def canonical_node_to_ir(
+        root: Node,
+        fields: Mapping[str, Field],
+        keys: Optional[SubtreeKeys],
+        build: IRBuilder = IR_BUILDER,
+) -> Optional[IRNode]:
+    if root.expression is not None:
+        return expression_to_ir(expression=root.expression, fields=fields, canonical=True, build=build)
+
+    if root.left is None and root.right is None:
+        return None
+
+    # commutative and associative: flatten chains, drop duplicates, sort operands by their SQL
+    operands: Dict[str, IRNode] = {}
+    for node in flatten(root, root.bool_operator):
+        operand = node_to_ir(root=node, fields=fields, canonical=True, keys=keys, build=build)
+        if operand is not None:
+            operands.setdefault(build.sql(operand), operand)
+    if not operands:
+        return None
+    texts = sorted(operands)
+    if len(texts) == 1:
+        return operands[texts[0]]
+    return build.Bool(root.bool_operator, tuple(operands[x] for x in texts))
+
 
+def plain_node_to_ir(
+        root: Node,
+        fields: Mapping[str, Field],
+        keys: Optional[SubtreeKeys],
+        build: IRBuilder = IR_BUILDER,
+) -> Optional[IRNode]:
+    left = None
+    right = None
+    result = None
 
-def to_sql(root: Node, fields: Mapping[str, Field]) -> str:
+    if root.expression is not None:
+        result = expression_to_ir(root.expression, fields, False, build)
+
+    # without cache children are compiled directly, node_to_ir has nothing to add
+    if keys is None:
+        if root.left is not None:
+            left = plain_node_to_ir(root.left, fields, keys, build)
+        if root.right is not None:
+            right = plain_node_to_ir(root.right, fields, keys, build)
+    else:
+        if root.left is not None:
+            left = node_to_ir(root.left, fields, False, keys, build)
+        if root.right is not None:
+            right = node_to_ir(root.right, fields, False, keys, build)
+
+    if left is not None and right is not None:
+        result = build.Bool(root.bool_operator, (left, right))
+    elif left is not None:
+        result = left
+    elif right is not None:
+        result = right
+
+    return result
+
+
+def node_to_ir(
+        root: Node,
+        fields: Mapping[str, Field],
+        canonical: bool,
+        keys: Optional[SubtreeKeys],
+        build: IRBuilder = IR_BUILDER,
+) -> Optional[IRNode]:
+    if keys is not None:
+        key = keys.key(root)
+        result = keys.cache.get(key)
+        if result is not None:
+            return result
+
+    if canonical:
+        result = canonical_node_to_ir(root=root, fields=fields, keys=keys, build=build)
+    else:
+        result = plain_node_to_ir(root=root, fields=fields, keys=keys, build=build)
+
+    if keys is not None and result is not None:
+        keys.cache.put(key, result)
+    return result
+
+
+def fingerprint(text: str) -> str:
     """
-    Returns ClickHouse WHERE clause for given tree and fields
+    Returns stable fingerprint of generated SQL, suitable as a cache key
     """
-    left = ""
-    right = ""
-    text = ""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    if root.expression is not None:
-        text = expression_to_sql(expression=root.expression, fields=fields)
 
-    if root.left is not None:
-        left = to_sql(root=root.left, fields=fields)
+def compile_root(
+        root: Node,
+        fields: Mapping[str, Field],
+        canonical: bool,
+        cache: Optional[CompileCache],
+        budget: Optional[Budget],
+        stats: Optional[WorkloadStats],
+        build: IRBuilder,
+):
+    if budget is not None:
+        root, _ = apply_budget(root=root, fields=fields, budget=budget)
+
+    keys = None
+    if cache is not None:
+        # IR and SQL text of the same subtree are cached under different keys
+        mode = f"{'canonical' if canonical else 'plain'}:{build.name}"
+        keys = SubtreeKeys(cache=cache, fields=fields, mode=mode)
+    result = node_to_ir(root=root, fields=fields, canonical=canonical, keys=keys, build=build)
+
+    if stats is not None:
+        stats.record(root=root, fields=fields)
+    return result
+
+
+def to_ir(
+        root: Node,
+        fields: Mapping[str, Field],
+        canonical: bool = False,
+        cache: Optional[CompileCache] = None,
+        budget: Optional[Budget] = None,
+        stats: Optional[WorkloadStats] = None,
+) -> Optional[IRNode]:
+    """
+    Returns intermediate representation for given tree and fields, None for an empty tree.
+    Fields are resolved and values validated here once, the result can be rendered
+    into any output form (render_where, render_parameterized, render_debug,
+    render_with_aliases), cached or pickled.
+    With canonical=True semantically identical trees produce identical output:
+    AND/OR chains are flattened, deduplicated and sorted, numbers compared
+    with numeric targets are normalized.
+    With cache, compiled unchanged subtrees are reused from previous compilations.
+    With budget, queries over the complexity budget are refused (FlyqlError) or reordered.
+    With stats, predicates of successfully compiled trees are recorded into the collector
+    """
+    return compile_root(root, fields, canonical, cache, budget, stats, IR_BUILDER)
+
 
-    if root.right is not None:
-        right = to_sql(root=root.right, fields=fields)
+def to_sql(
+        root: Node,
+        fields: Mapping[str, Field],
+        canonical: bool = False,
+        cache: Optional[CompileCache] = None,
+        budget: Optional[Budget] = None,
+        stats: Optional[WorkloadStats] = None,
+) -> str:
+    """
+    Returns ClickHouse WHERE clause for given tree and fields, see to_ir for the options.
+    Equals render_where(to_ir(...)), but the text is built directly without the IR,
+    and with cache the text of unchanged subtrees is reused
+    """
+    return compile_root(root, fields, canonical, cache, budget, stats, TEXT_BUILDER) or ""
 
-    if len(left) > 0 and len(right) > 0:
-        text = f"({left} {root.bool_operator} {right})"
-    elif len(left) > 0:
-        text = left
-    elif len(right) > 0:
-        text = right
 
-    return text
+def to_sql_with_aliases(root: Node, fields: Mapping[str, Field]) -> Tuple[str, str]:
+    """
+    Returns WITH clause and ClickHouse WHERE clause for given tree and fields,
+    JSON/Map accesses used more than once are evaluated once per row through aliases.
+    WITH clause is empty if nothing is repeated
+    """
+    return render_with_aliases(to_ir(root=root, fields=fields))
@@ -1,8 +1,39 @@
 import re
-from typing import Optional, Set, Tuple
+from types import MappingProxyType
+from typing import FrozenSet, List, Optional, Tuple
 
 from flyql.exceptions import FlyqlError
 from flyql.constants import Operator
+from flyql.tree import Node
+
+from .constants import NORMALIZED_TYPE_BOOL, NORMALIZED_TYPE_FLOAT, NORMALIZED_TYPE_INT, NORMALIZED_TYPE_STRING
+
+LIKE_PATTERN_CHAR = "*"
+SQL_LIKE_PATTERN_CHAR = "%"
+BOOL_LITERALS = frozenset({"true", "false"})
+
+ESCAPE_CHARS_MAP = MappingProxyType({
+    "\b": "\\b",
+    "\f": "\\f",
+    "\r": "\\r",
+    "\n": "\\n",
+    "\t": "\\t",
+    "\0": "\\0",
+    "\a": "\\a",
+    "\v": "\\v",
+    "\\": "\\\\",
+    "'": "\\'",
+})
+ESCAPE_TRANSLATION = str.maketrans(dict(ESCAPE_CHARS_MAP))
+
+DEFAULT_VALUE_COMPARISONS = MappingProxyType({
+    Operator.EQUALS.value: lambda x, y: x == y,
+    Operator.NOT_EQUALS.value: lambda x, y: x != y,
+    Operator.GREATER_THAN.value: lambda x, y: x > y,
+    Operator.LOWER_THAN.value: lambda x, y: x < y,
+    Operator.GREATER_OR_EQUALS_THAN.value: lambda x, y: x >= y,
+    Operator.LOWER_OR_EQUALS_THAN.value: lambda x, y: x <= y,
+})
 
 
 def get_value_type(value) -> str:
@@ -18,7 +49,7 @@ def get_value_type(value) -> str:
         return ''
 
 
-FORBIDDEN_OPERATIONS: Set[Tuple[str, str, str]] = {
+FORBIDDEN_OPERATIONS: FrozenSet[Tuple[str, str, str]] = frozenset({
     # String vs numbers comparison
     ('string', Operator.LOWER_THAN.value, 'int'),
     ('string', Operator.LOWER_THAN.value, 'float'),
@@ -40,7 +71,58 @@ FORBIDDEN_OPERATIONS: Set[Tuple[str, str, str]] = {
     ('bool', Operator.GREATER_THAN.value, 'bool'),
     ('bool', Operator.GREATER_OR_EQUALS_THAN.value, 'bool'),
     ('bool', Operator.LOWER_OR_EQUALS_THAN.value, 'bool'),
-}
+})
+
+
+def escape_param(item) -> str:
+    if item is None:
+        return "NULL"
+    elif isinstance(item, str):
+        return "'%s'" % item.translate(ESCAPE_TRANSLATION)
+    elif isinstance(item, bool):
+        return str(item)
+    elif isinstance(item, (int, float)):
+        return str(item)
+    else:
+        return str(item)
+
+
+def is_number(value) -> bool:
+    try:
+        float(value)
+    except (ValueError, TypeError):
+        try:
+            int(value)
+        except (ValueError, TypeError):
+            return False
+        else:
+            return True
+    else:
+        return True
+
+
+def prepare_like_pattern_value(value: str) -> Tuple[bool, str]:
+    pattern_found = False
+    new_value = ""
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char == LIKE_PATTERN_CHAR:
+            if i > 0 and value[i - 1] == "\\":
+                new_value += LIKE_PATTERN_CHAR
+            else:
+                new_value += SQL_LIKE_PATTERN_CHAR
+                pattern_found = True
+        elif char == SQL_LIKE_PATTERN_CHAR:
+            pattern_found = True
+            new_value += "\\"
+            new_value += SQL_LIKE_PATTERN_CHAR
+        elif char == "\\" and i + 1 < len(value) and value[i + 1] == LIKE_PATTERN_CHAR:
+            new_value += "\\"
+        else:
+            new_value += char
+        i += 1
+    return pattern_found, new_value
 
 
 def validate_operation(value, field_normalized_type: str, operator: str):
@@ -51,3 +133,65 @@ def validate_operation(value, field_normalized_type: str, operator: str):
         raise FlyqlError(
             f"operation not allowed: {field_normalized_type} field with '{operator}' operator"
         )
+
+
+def value_fits_type(value, normalized_type: Optional[str], operator: str) -> bool:
+    """
+    Returns True if value can be compared using operator with a column
+    of normalized_type without a conversion error
+    """
+    if (normalized_type, operator, get_value_type(value)) in FORBIDDEN_OPERATIONS:
+        return False
+    if operator in (Operator.EQUALS_REGEX.value, Operator.NOT_EQUALS_REGEX.value):
+        return True
+    if normalized_type in (NORMALIZED_TYPE_INT, NORMALIZED_TYPE_FLOAT):
+        return is_number(value)
+    if normalized_type == NORMALIZED_TYPE_BOOL:
+        return (isinstance(value, str) and value.lower() in BOOL_LITERALS) or is_number(value)
+    return True
+
+
+def matches_default_value(value, normalized_type: Optional[str], operator: str) -> bool:
+    """
+    Returns True if the default value of a column of normalized_type
+    (zero, false or empty string) may satisfy the comparison with value
+    """
+    if operator in (Operator.EQUALS_REGEX.value, Operator.NOT_EQUALS_REGEX.value):
+        if normalized_type != NORMALIZED_TYPE_STRING:
+            return True
+        try:
+            found = re.search(str(value), "") is not None
+        except re.error:
+            return True
+        return found == (operator == Operator.EQUALS_REGEX.value)
+    if operator not in DEFAULT_VALUE_COMPARISONS:
+        return True
+    if normalized_type in (NORMALIZED_TYPE_INT, NORMALIZED_TYPE_FLOAT, NORMALIZED_TYPE_BOOL):
+        if isinstance(value, str) and value.lower() in BOOL_LITERALS:
+            value = value.lower() == "true"
+        if not is_number(value):
+            return True
+        return DEFAULT_VALUE_COMPARISONS[operator](0, float(value))
+    if normalized_type == NORMALIZED_TYPE_STRING and isinstance(value, str):
+        return DEFAULT_VALUE_COMPARISONS[operator]("", value)
+    return True
+
+
+def flatten(root: Node, bool_operator: str) -> List[Node]:
+    """
+    Returns operands of a chain of nodes joined with the same bool operator
+    """
+    while root.expression is None and (root.left is None) != (root.right is None):
+        root = root.left if root.left is not None else root.right
+
+    if root.expression is not None or root.left is None or root.bool_operator != bool_operator:
+        return [root]
+
+    return flatten(root.left, bool_operator) + flatten(root.right, bool_operator)
+
+
+def build_chain(bool_operator: str, operands: List[Node]) -> Node:
+    root = operands[0]
+    for operand in operands[1:]:
+        root = Node(bool_operator, None, root, operand)
+    return root
@@ -0,0 +1,134 @@
+from typing import Dict, Hashable, Iterable, Mapping, Optional, Set, Tuple
+
+from flyql.tree import Node
+
+from .field import Field
+from .generator import to_sql
+
+# (field name, path), path is None for the whole field
+Reference = Tuple[str, Optional[str]]
+
+
+def reference_path(field: Optional[Field], parts) -> str:
+    if field is not None:
+        return field.path_key(parts)
+    return ":".join(parts)
+
+
+def references(root: Node, fields: Mapping[str, Field]) -> Set[Reference]:
+    """
+    Returns fields and paths referenced by the tree
+    """
+    result = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.expression is not None:
+            spl = node.expression.key.split(":")
+            if len(spl) == 1:
+                result.add((spl[0], None))
+            else:
+                result.add((spl[0], reference_path(fields.get(spl[0]), spl[1:])))
+        if node.left is not None:
+            stack.append(node.left)
+        if node.right is not None:
+            stack.append(node.right)
+    return result
+
+
+def is_subpath(path: str, parent: str) -> bool:
+    return path == parent or path.startswith(parent + ".") or path.startswith(parent + ":")
+
+
+def changed_paths(old: Mapping[str, str], new: Mapping[str, str]) -> Set[str]:
+    return {x for x in set(old) | set(new) if old.get(x) != new.get(x)}
+
+
+def field_changes(name: str, old: Field, new: Field) -> Set[Reference]:
+    if (
+            old.name != new.name
+            or old.jsonstring != new.jsonstring
+            or old.values != new.values
+            or old.map_keys_indexed != new.map_keys_indexed
+            or old.map_values_indexed != new.map_values_indexed
+            or old.normalized_type != new.normalized_type
+            or (not old.is_json and old.type != new.type)
+    ):
+        return {(name, None)}
+
+    paths = changed_paths(old.json_typed_paths, new.json_typed_paths)
+    paths |= changed_paths(old.json_paths, new.json_paths)
+    paths |= changed_paths(
+        {k: (v.column, v.type) for k, v in old.path_aliases.items()},
+        {k: (v.column, v.type) for k, v in new.path_aliases.items()},
+    )
+    return {(name, x) for x in paths}
+
+
+def diff_schemas(old: Mapping[str, Field], new: Mapping[str, Field]) -> Set[Reference]:
+    """
+    Returns fields and paths whose generated SQL may differ between two schemas
+    """
+    changes = set()
+    for name in set(old) | set(new):
+        if name not in old or name not in new:
+            changes.add((name, None))
+        else:
+            changes |= field_changes(name, old[name], new[name])
+    return changes
+
+
+class ImpactIndex:
+    """
+    Reverse index from fields and paths to the compiled queries referencing them,
+    filled as queries are compiled through it
+    """
+
+    def __init__(self):
+        self._queries: Dict[Hashable, Set[Reference]] = {}
+        self._fields: Dict[str, Dict[Optional[str], Set[Hashable]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def compile(self, query_id: Hashable, root: Node, fields: Mapping[str, Field], **kwargs) -> str:
+        """
+        Returns to_sql result for the tree and records what the query references
+        """
+        text = to_sql(root=root, fields=fields, **kwargs)
+        self.add(query_id, references(root, fields))
+        return text
+
+    def add(self, query_id: Hashable, refs: Iterable[Reference]) -> None:
+        self.remove(query_id)
+        refs = set(refs)
+        self._queries[query_id] = refs
+        for name, path in refs:
+            self._fields.setdefault(name, {}).setdefault(path, set()).add(query_id)
+
+    def remove(self, query_id: Hashable) -> None:
+        for name, path in self._queries.pop(query_id, ()):
+            paths = self._fields[name]
+            paths[path].discard(query_id)
+            if not paths[path]:
+                del paths[path]
+            if not paths:
+                del self._fields[name]
+
+    def references(self, query_id: Hashable) -> Set[Reference]:
+        return set(self._queries.get(query_id, ()))
+
+    def affected(self, changes: Iterable[Reference]) -> Set[Hashable]:
+        """
+        Returns queries referencing any of changed fields or paths
+        """
+        result = set()
+        for name, changed_path in changes:
+            paths = self._fields.get(name, {})
+            for path, query_ids in paths.items():
+                if changed_path is None or (path is not None and is_subpath(path, changed_path)):
+                    result |= query_ids
+        return result
+
+    def affected_by_schema_change(self, old: Mapping[str, Field], new: Mapping[str, Field]) -> Set[Hashable]:
+        return self.affected(diff_schemas(old, new))
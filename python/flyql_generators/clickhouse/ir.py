@@ -0,0 +1,163 @@
+from typing import Any, Optional, Tuple
+
+STRATEGY_COLUMN = "column"
+STRATEGY_PATH_ALIAS = "path_alias"
+STRATEGY_JSON_STRING = "json_string"
+STRATEGY_JSON_TYPED = "json_typed"
+STRATEGY_JSON_HINTED = "json_hinted"
+STRATEGY_JSON_DYNAMIC = "json_dynamic"
+STRATEGY_MAP = "map"
+STRATEGY_ARRAY = "array"
+
+
+class IRNode:
+    """
+    Base of the intermediate representation produced by the generator.
+    Nodes are immutable once built, compare by value and can be pickled,
+    so a compiled tree can be cached, shared between threads and rendered
+    any number of times without resolving fields or validating again.
+    Attributes are declared in __slots__ in the order of constructor arguments
+    """
+
+    __slots__ = ()
+
+    def _init(self, *values) -> None:
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def _values(self) -> Tuple:
+        return tuple(getattr(self, x) for x in self.__slots__)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return type(self), self._values()
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self._values() == other._values()
+
+    def __hash__(self) -> int:
+        return hash((type(self).__name__,) + self._values())
+
+    def __repr__(self) -> str:
+        args = ", ".join(f"{k}={v!r}" for k, v in zip(self.__slots__, self._values()))
+        return f"{type(self).__name__}({args})"
+
+
+class Raw(IRNode):
+    """
+    SQL fragment that is not user input: type names, constants, array indexes
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self._init(text)
+
+
+class Column(IRNode):
+    """
+    Column or subcolumn reference, already quoted where needed
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self._init(name)
+
+
+class Literal(IRNode):
+    """
+    User supplied value. value is the normalized python value, text is
+    its SQL literal and type is the ClickHouse type used as query parameter,
+    None if the literal is always rendered inline (NULL)
+    """
+
+    __slots__ = ("value", "text", "type")
+
+    def __init__(self, value: Any, text: str, type: Optional[str]):
+        self._init(value, text, type)
+
+
+class Call(IRNode):
+
+    __slots__ = ("name", "args")
+
+    def __init__(self, name: str, args: Tuple[IRNode, ...]):
+        self._init(name, tuple(args))
+
+
+class Subscript(IRNode):
+
+    __slots__ = ("base", "index")
+
+    def __init__(self, base: IRNode, index: IRNode):
+        self._init(base, index)
+
+
+class Access(IRNode):
+    """
+    JSON/Map access that is worth evaluating once per row
+    when it is repeated across a tree
+    """
+
+    __slots__ = ("expression",)
+
+    def __init__(self, expression: IRNode):
+        self._init(expression)
+
+
+class Compare(IRNode):
+
+    __slots__ = ("left", "operator", "right")
+
+    def __init__(self, left: IRNode, operator: str, right: IRNode):
+        self._init(left, operator, right)
+
+
+class Not(IRNode):
+
+    __slots__ = ("operand",)
+
+    def __init__(self, operand: IRNode):
+        self._init(operand)
+
+
+class MultiIf(IRNode):
+
+    __slots__ = ("branches", "default")
+
+    def __init__(self, branches: Tuple[Tuple[IRNode, IRNode], ...], default: IRNode):
+        self._init(tuple(tuple(x) for x in branches), default)
+
+
+class Bool(IRNode):
+
+    __slots__ = ("operator", "operands")
+
+    def __init__(self, operator: str, operands: Tuple[IRNode, ...]):
+        self._init(operator, tuple(operands))
+
+
+class Predicate(IRNode):
+    """
+    Compiled expression: the condition together with the resolved field,
+    path and the access strategy chosen for it
+    """
+
+    __slots__ = ("key", "field", "path", "operator", "strategy", "condition")
+
+    def __init__(
+            self,
+            key: str,
+            field: str,
+            path: Tuple[str, ...],
+            operator: str,
+            strategy: str,
+            condition: IRNode,
+    ):
+        self._init(key, field, tuple(path), operator, strategy, condition)
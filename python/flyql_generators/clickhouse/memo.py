@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+from flyql.expression import Expression
+from flyql.tree import Node
+
+from .field import Field
+from .ir import IRNode
+
+# compiled subtree, IR for to_ir, SQL text for to_sql
+Fragment = Union[IRNode, str]
+
+DEFAULT_CACHE_SIZE = 8192
+DEFAULT_CACHE_SHARDS = 16
+
+
+class CacheShard:
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.items: "OrderedDict[int, Fragment]" = OrderedDict()
+        self.lock = threading.Lock()
+
+
+class CompileCache:
+    """
+    Bounded LRU cache of compiled fragments (IR or SQL text) keyed by structural subtree hash.
+    Create one per session, or use shared_cache to share fragments between sessions.
+    Keys are spread over independently locked shards, so threads compiling
+    concurrently rarely wait for each other
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE, shards: int = DEFAULT_CACHE_SHARDS):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        if shards <= 0:
+            raise ValueError("shards must be positive")
+        shards = min(shards, maxsize)
+        self.maxsize = maxsize
+        self._shards = [CacheShard(maxsize // shards + (i < maxsize % shards)) for i in range(shards)]
+
+    def __len__(self) -> int:
+        return sum(len(x.items) for x in self._shards)
+
+    @property
+    def hits(self) -> int:
+        return sum(x.hits for x in self._shards)
+
+    @property
+    def misses(self) -> int:
+        return sum(x.misses for x in self._shards)
+
+    def _shard(self, key: int) -> CacheShard:
+        # keys are uniformly distributed hashes
+        return self._shards[key % len(self._shards)]
+
+    def get(self, key: int) -> Optional[Fragment]:
+        shard = self._shard(key)
+        with shard.lock:
+            value = shard.items.get(key)
+            if value is None:
+                shard.misses += 1
+                return None
+            shard.items.move_to_end(key)
+            shard.hits += 1
+            return value
+
+    def put(self, key: int, value: Fragment) -> None:
+        shard = self._shard(key)
+        with shard.lock:
+            shard.items[key] = value
+            shard.items.move_to_end(key)
+            while len(shard.items) > shard.maxsize:
+                shard.items.popitem(last=False)
+
+    def clear(self) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                shard.items.clear()
+                shard.hits = 0
+                shard.misses = 0
+
+
+shared_cache = CompileCache()
+
+
+def expression_key(expression: Expression, field_key: Optional[int]) -> Tuple:
+    value = expression.value
+    return expression.key, expression.operator, type(value).__name__, value, field_key
+
+
+class SubtreeKeys:
+    """
+    Structural keys of the nodes of one tree, computed bottom-up once per compilation.
+    Two subtrees get the same key if they compile to the same SQL with the same fields.
+    A key hashes the keys of the children rather than the subtrees themselves,
+    so computing all keys of a tree costs one small tuple hash per node
+    """
+
+    def __init__(self, cache: CompileCache, fields: Mapping[str, Field], mode: str):
+        self.cache = cache
+        self.fields = fields
+        self.mode = mode
+        self._keys: Dict[int, int] = {}
+        self._field_keys: Dict[str, Optional[int]] = {}
+
+    def _field_key(self, expression: Expression) -> Optional[int]:
+        name = expression.key.split(":")[0]
+        if name not in self._field_keys:
+            field = self.fields.get(name)
+            self._field_keys[name] = hash(field.cache_key()) if field is not None else None
+        return self._field_keys[name]
+
+    def key(self, root: Node) -> int:
+        key = self._keys.get(id(root))
+        if key is not None:
+            return key
+
+        expression = None
+        if root.expression is not None:
+            expression = expression_key(root.expression, self._field_key(root.expression))
+        left = self.key(root.left) if root.left is not None else None
+        right = self.key(root.right) if root.right is not None else None
+
+        bool_operator = root.bool_operator if left is not None or right is not None else None
+        key = hash((self.mode, bool_operator, expression, left, right))
+        self._keys[id(root)] = key
+        return key
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from flyql.exceptions import FlyqlError
+from flyql.tree import Node
+
+from .constants import NORMALIZED_TYPE_DATE
+from .field import Field
+from .generator import escape_param, to_sql
+
+DEFAULT_INITIAL_WINDOW = timedelta(minutes=5)
+DEFAULT_GROWTH_FACTOR = 2.0
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+DATETIME_PRECISION = 6
+
+
+class TimeSlice:
+    """
+    Query for one time window, bounds are [start, end)
+    """
+
+    def __init__(self, start: datetime, end: datetime, where: str):
+        self.start = start
+        self.end = end
+        self.where = where
+
+    def __repr__(self) -> str:
+        return f"TimeSlice({self.start!r}, {self.end!r}, {self.where!r})"
+
+
+def time_windows(
+        start: datetime,
+        end: datetime,
+        initial_window: timedelta = DEFAULT_INITIAL_WINDOW,
+        growth_factor: float = DEFAULT_GROWTH_FACTOR,
+        max_window: Optional[timedelta] = None,
+) -> Iterator[Tuple[datetime, datetime]]:
+    """
+    Yields adjacent windows covering [start, end), newest first,
+    each window is growth_factor times larger than the previous one
+    """
+    if start >= end:
+        raise FlyqlError("time range start must be before end")
+    if initial_window <= timedelta(0):
+        raise FlyqlError("initial window must be positive")
+    if growth_factor < 1:
+        raise FlyqlError("growth factor must be at least 1")
+    if max_window is not None and max_window <= timedelta(0):
+        raise FlyqlError("max window must be positive")
+
+    window = initial_window
+    window_end = end
+    while window_end > start:
+        if max_window is not None:
+            window = min(window, max_window)
+        window_start = max(start, window_end - window)
+        yield window_start, window_end
+        window_end = window_start
+        window = window * growth_factor
+
+
+def datetime_to_sql(value: datetime) -> str:
+    if value.tzinfo is None:
+        return f"toDateTime64({escape_param(value.strftime(DATETIME_FORMAT))}, {DATETIME_PRECISION})"
+    value = value.astimezone(timezone.utc)
+    return f"toDateTime64({escape_param(value.strftime(DATETIME_FORMAT))}, {DATETIME_PRECISION}, 'UTC')"
+
+
+def time_range_to_sql(time_field: Field, start: datetime, end: datetime) -> str:
+    return f"{time_field.name} >= {datetime_to_sql(start)} and {time_field.name} < {datetime_to_sql(end)}"
+
+
+def plan_time_slices(
+        root: Optional[Node],
+        fields: Mapping[str, Field],
+        time_field: Field,
+        start: datetime,
+        end: datetime,
+        initial_window: timedelta = DEFAULT_INITIAL_WINDOW,
+        growth_factor: float = DEFAULT_GROWTH_FACTOR,
+        max_window: Optional[timedelta] = None,
+) -> Iterator[TimeSlice]:
+    """
+    Yields per-window queries over [start, end), newest window first.
+    The filter is compiled once, queries differ only in their time bounds
+    """
+    if time_field.normalized_type != NORMALIZED_TYPE_DATE:
+        raise FlyqlError(f"time field must have date type: {time_field.name}")
+
+    text = to_sql(root=root, fields=fields) if root is not None else ""
+    windows = time_windows(start, end, initial_window, growth_factor, max_window)
+    for window_start, window_end in windows:
+        where = time_range_to_sql(time_field, window_start, window_end)
+        if text:
+            where = f"{text} and {where}"
+        yield TimeSlice(window_start, window_end, where)
+
+
+def progressive_search(
+        slices: Iterable[TimeSlice],
+        executor: Callable[[TimeSlice, int], Sequence],
+        limit: int,
+) -> List:
+    """
+    Runs slices in order until limit rows are found.
+    executor receives a slice and the number of rows still needed
+    and returns rows of that window, newest first
+    """
+    rows: List = []
+    for time_slice in slices:
+        rows.extend(executor(time_slice, limit - len(rows)))
+        if len(rows) >= limit:
+            break
+    return rows[:limit]
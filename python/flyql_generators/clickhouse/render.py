@@ -0,0 +1,272 @@
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .ir import (
+    Access,
+    Bool,
+    Call,
+    Column,
+    Compare,
+    IRNode,
+    Literal,
+    MultiIf,
+    Not,
+    Predicate,
+    Raw,
+    Subscript,
+)
+
+ALIAS_PREFIX = "_fq_"
+MIN_ALIAS_OCCURRENCES = 2
+PARAM_PREFIX = "p"
+
+RENDER_METHODS = MappingProxyType({
+    Raw: "render_raw",
+    Column: "render_column",
+    Literal: "render_literal",
+    Call: "render_call",
+    Subscript: "render_subscript",
+    Access: "render_access",
+    Compare: "render_compare",
+    Not: "render_not",
+    MultiIf: "render_multi_if",
+    Bool: "render_bool",
+    Predicate: "render_predicate",
+})
+
+
+class Renderer:
+    """
+    Renders IR as ClickHouse WHERE clause. Other output forms override
+    methods for the nodes they render differently
+    """
+
+    def __init__(self):
+        self._methods: Dict[type, Callable[[Any], str]] = {
+            k: getattr(self, v) for k, v in RENDER_METHODS.items()
+        }
+
+    def render(self, node: IRNode) -> str:
+        return self._methods[type(node)](node)
+
+    def render_raw(self, node: Raw) -> str:
+        return node.text
+
+    def render_column(self, node: Column) -> str:
+        return node.name
+
+    def render_literal(self, node: Literal) -> str:
+        return node.text
+
+    def render_call(self, node: Call) -> str:
+        return TextBuilder.Call(node.name, [self.render(x) for x in node.args])
+
+    def render_subscript(self, node: Subscript) -> str:
+        return TextBuilder.Subscript(self.render(node.base), self.render(node.index))
+
+    def render_access(self, node: Access) -> str:
+        return self.render(node.expression)
+
+    def render_compare(self, node: Compare) -> str:
+        return TextBuilder.Compare(self.render(node.left), node.operator, self.render(node.right))
+
+    def render_not(self, node: Not) -> str:
+        return TextBuilder.Not(self.render(node.operand))
+
+    def render_multi_if(self, node: MultiIf) -> str:
+        branches = [(self.render(x), self.render(y)) for x, y in node.branches]
+        return TextBuilder.MultiIf(branches, self.render(node.default))
+
+    def render_bool(self, node: Bool) -> str:
+        return TextBuilder.Bool(node.operator, [self.render(x) for x in node.operands])
+
+    def render_predicate(self, node: Predicate) -> str:
+        return self.render(node.condition)
+
+
+class ParameterRenderer(Renderer):
+    """
+    Renders literals as ClickHouse query parameters ({p0:String}),
+    collecting their values into params
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.params: Dict[str, Any] = {}
+
+    def render_literal(self, node: Literal) -> str:
+        if node.type is None:
+            return node.text
+        name = f"{PARAM_PREFIX}{len(self.params)}"
+        self.params[name] = node.value
+        return "{%s:%s}" % (name, node.type)
+
+
+def comment_text(text: str) -> str:
+    """
+    Returns text safe to put into a SQL comment, it can not open or close one
+    """
+    return text.replace("*/", "* /").replace("/*", "/ *")
+
+
+class DebugRenderer(Renderer):
+    """
+    Renders WHERE clause with every predicate tagged by its access strategy
+    """
+
+    def render_predicate(self, node: Predicate) -> str:
+        tag = comment_text(f"{node.strategy} {node.key} {node.operator}")
+        return f"/* {tag} */ {self.render(node.condition)}"
+
+
+class AccessCounter(Renderer):
+
+    def __init__(self):
+        super().__init__()
+        self.counts: Dict[str, int] = {}
+
+    def render_access(self, node: Access) -> str:
+        text = self.render(node.expression)
+        self.counts[text] = self.counts.get(text, 0) + 1
+        return text
+
+
+class AliasRenderer(Renderer):
+    """
+    Renders accesses repeated across a tree as references to WITH aliases
+    """
+
+    def __init__(self, counts: Dict[str, int]):
+        super().__init__()
+        self.aliases: Dict[str, str] = {}
+        for text, count in counts.items():
+            if count >= MIN_ALIAS_OCCURRENCES:
+                self.aliases[text] = f"{ALIAS_PREFIX}{len(self.aliases)}"
+
+    def render_access(self, node: Access) -> str:
+        text = self.render(node.expression)
+        return self.aliases.get(text, text)
+
+    def with_clause(self) -> str:
+        if not self.aliases:
+            return ""
+        return "WITH " + ", ".join(f"{text} AS {alias}" for text, alias in self.aliases.items())
+
+
+def render_where(root: Optional[IRNode]) -> str:
+    if root is None:
+        return ""
+    return Renderer().render(root)
+
+
+def render_parameterized(root: Optional[IRNode]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Returns WHERE clause with values replaced by query parameters and the parameter values
+    """
+    if root is None:
+        return "", {}
+    renderer = ParameterRenderer()
+    text = renderer.render(root)
+    return text, renderer.params
+
+
+def render_debug(root: Optional[IRNode]) -> str:
+    if root is None:
+        return ""
+    return DebugRenderer().render(root)
+
+
+def render_with_aliases(root: Optional[IRNode]) -> Tuple[str, str]:
+    """
+    Returns WITH clause and WHERE clause, JSON/Map accesses used more than once
+    are evaluated once per row through aliases. WITH clause is empty if nothing is repeated
+    """
+    if root is None:
+        return "", ""
+    counter = AccessCounter()
+    counter.render(root)
+    renderer = AliasRenderer(counter.counts)
+    text = renderer.render(root)
+    return renderer.with_clause(), text
+
+
+class IRBuilder:
+    """
+    Builds IR nodes, the builder the generator uses unless it is asked for SQL text
+    """
+
+    name = "ir"
+    Raw = Raw
+    Column = Column
+    Literal = Literal
+    Call = Call
+    Subscript = Subscript
+    Access = Access
+    Compare = Compare
+    Not = Not
+    MultiIf = MultiIf
+    Bool = Bool
+    Predicate = Predicate
+    sql = staticmethod(render_where)
+
+
+class TextBuilder(IRBuilder):
+    """
+    Builds SQL text in place of IR nodes. The generator builds conditions
+    through a builder, with this one it produces the WHERE clause directly,
+    the same text Renderer renders from IR, without building the IR
+    """
+
+    name = "sql"
+
+    @staticmethod
+    def Raw(text: str) -> str:
+        return text
+
+    @staticmethod
+    def Column(name: str) -> str:
+        return name
+
+    @staticmethod
+    def Literal(value: Any, text: str, type: Optional[str]) -> str:
+        return text
+
+    @staticmethod
+    def Call(name: str, args: Tuple[str, ...]) -> str:
+        return "%s(%s)" % (name, ", ".join(args))
+
+    @staticmethod
+    def Subscript(base: str, index: str) -> str:
+        return f"{base}[{index}]"
+
+    @staticmethod
+    def Access(expression: str) -> str:
+        return expression
+
+    @staticmethod
+    def Compare(left: str, operator: str, right: str) -> str:
+        return f"{left} {operator} {right}"
+
+    @staticmethod
+    def Not(operand: str) -> str:
+        return f"not {operand}"
+
+    @staticmethod
+    def MultiIf(branches: Tuple[Tuple[str, str], ...], default: str) -> str:
+        return "multiIf(%s)" % ",".join([f"{x}, {y}" for x, y in branches] + [default])
+
+    @staticmethod
+    def Bool(operator: str, operands: Tuple[str, ...]) -> str:
+        return "(%s)" % f" {operator} ".join(operands)
+
+    @staticmethod
+    def Predicate(key: str, field: str, path: Tuple[str, ...], operator: str, strategy: str, condition: str) -> str:
+        return condition
+
+    @staticmethod
+    def sql(node: str) -> str:
+        return node
+
+
+IR_BUILDER = IRBuilder()
+TEXT_BUILDER = TextBuilder()
@@ -0,0 +1,80 @@
+from typing import Mapping, Optional, Tuple
+
+from flyql.constants import Operator
+from flyql.tree import Node
+
+from .constants import BOOL_OPERATOR_AND, BOOL_OPERATOR_OR
+from .cost import expression_cost, get_expression_field
+from .field import Field
+from .helpers import build_chain, flatten
+
+DEFAULT_SELECTIVITY = 0.5
+NEGATIVE_OPERATORS = frozenset({Operator.NOT_EQUALS.value, Operator.NOT_EQUALS_REGEX.value})
+
+
+def expression_selectivity(root: Node, fields: Mapping[str, Field], selectivity: Mapping[str, float]) -> float:
+    field = get_expression_field(root.expression, fields)
+    name = field.name if field is not None else root.expression.key
+    value = selectivity.get(name, DEFAULT_SELECTIVITY)
+    if root.expression.operator in NEGATIVE_OPERATORS:
+        value = 1 - value
+    return min(max(value, 0.0), 1.0)
+
+
+def rank(cost: float, selectivity: float, bool_operator: str) -> float:
+    # cost per row eliminated (and) or per row accepted (or), lower runs first
+    discard = 1 - selectivity if bool_operator == BOOL_OPERATOR_AND else selectivity
+    if discard <= 0:
+        return float("inf")
+    return cost / discard
+
+
+def reorder_node(
+        root: Node,
+        fields: Mapping[str, Field],
+        selectivity: Mapping[str, float],
+) -> Tuple[Node, float, float]:
+    """
+    Returns reordered node with its expected per-row cost and selectivity
+    """
+    if root.expression is not None:
+        cost = expression_cost(root.expression, fields)
+        return root, cost, expression_selectivity(root, fields, selectivity)
+
+    if root.left is None and root.right is None:
+        return root, 0, 1.0
+
+    if root.left is None or root.right is None:
+        child = root.left if root.left is not None else root.right
+        return reorder_node(child, fields, selectivity)
+
+    bool_operator = root.bool_operator
+    operands = [reorder_node(x, fields, selectivity) for x in flatten(root, bool_operator)]
+    operands.sort(key=lambda x: rank(x[1], x[2], bool_operator))
+
+    # operands after the first only run for rows the previous ones did not decide
+    cost = 0.0
+    passed = 1.0
+    for _, operand_cost, operand_selectivity in operands:
+        cost += passed * operand_cost
+        if bool_operator == BOOL_OPERATOR_OR:
+            passed *= 1 - operand_selectivity
+        else:
+            passed *= operand_selectivity
+
+    result_selectivity = 1 - passed if bool_operator == BOOL_OPERATOR_OR else passed
+    return build_chain(bool_operator, [x[0] for x in operands]), cost, result_selectivity
+
+
+def reorder(
+        root: Node,
+        fields: Mapping[str, Field],
+        selectivity: Optional[Mapping[str, float]] = None,
+) -> Node:
+    """
+    Returns copy of the tree with AND/OR operands ordered so cheap and selective
+    conditions are evaluated first.
+    selectivity maps field name to the estimated fraction of rows matching its conditions
+    """
+    node, _, _ = reorder_node(root, fields, selectivity or {})
+    return node
@@ -0,0 +1,310 @@
+import re
+import threading
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+
+from .cost import COST_LIKE, REGEX_OPERATORS, compare_cost, get_expression_field
+from .field import Field
+from .helpers import SQL_LIKE_PATTERN_CHAR, escape_param, is_number, prepare_like_pattern_value
+
+SHAPE_EXACT = "exact"
+SHAPE_PREFIX = "prefix"
+SHAPE_SUFFIX = "suffix"
+SHAPE_INFIX = "infix"
+SHAPE_PATTERN = "pattern"
+SHAPE_REGEX = "regex"
+SHAPE_RANGE = "range"
+PATTERN_SHAPES = frozenset({SHAPE_PREFIX, SHAPE_SUFFIX, SHAPE_INFIX, SHAPE_PATTERN})
+
+RANGE_OPERATORS = frozenset({
+    Operator.GREATER_THAN.value,
+    Operator.LOWER_THAN.value,
+    Operator.GREATER_OR_EQUALS_THAN.value,
+    Operator.LOWER_OR_EQUALS_THAN.value,
+})
+
+DEFAULT_MAX_KEYS = 10000
+DEFAULT_MAX_VALUES = 1024
+DEFAULT_STATS_SHARDS = 16
+SET_INDEX_MAX_CARDINALITY = 256
+INDEX_GRANULARITY = 4
+NGRAM_INDEX_TYPE = "ngrambf_v1(3, 256, 2, 0)"
+TOKEN_INDEX_TYPE = "tokenbf_v1(256, 2, 0)"
+NAME_SANITIZE_PATTERN = re.compile(r'[^a-zA-Z0-9]+')
+
+# (field name, path, operator, shape)
+StatsKey = Tuple[str, Optional[str], str, str]
+
+
+def wildcard_positions(value: str) -> List[int]:
+    positions = []
+    escaped = False
+    for i, char in enumerate(value):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == SQL_LIKE_PATTERN_CHAR:
+            positions.append(i)
+    return positions
+
+
+def pattern_shape(expression: Expression, field: Optional[Field]) -> str:
+    if expression.operator in REGEX_OPERATORS:
+        return SHAPE_REGEX
+    if expression.operator in RANGE_OPERATORS:
+        return SHAPE_RANGE
+    if compare_cost(expression, field) != COST_LIKE:
+        return SHAPE_EXACT
+
+    _, value = prepare_like_pattern_value(expression.value)
+    wildcards = wildcard_positions(value)
+    last = len(value) - 1
+    if not wildcards:
+        return SHAPE_EXACT
+    if wildcards == [0, last] and last > 0:
+        return SHAPE_INFIX
+    if wildcards == [0]:
+        return SHAPE_SUFFIX
+    if wildcards == [last]:
+        return SHAPE_PREFIX
+    return SHAPE_PATTERN
+
+
+def value_kind(value) -> str:
+    if not is_number(value):
+        return "string"
+    if isinstance(value, bool) or float(value).is_integer():
+        return "int"
+    return "float"
+
+
+class PredicateStats:
+
+    def __init__(self):
+        self.count = 0
+        self.values: Set[int] = set()
+        self.values_saturated = False
+        self.kinds: Dict[str, int] = {}
+
+    @property
+    def cardinality(self) -> int:
+        return len(self.values)
+
+    def copy(self) -> "PredicateStats":
+        item = PredicateStats()
+        item.count = self.count
+        item.values = set(self.values)
+        item.values_saturated = self.values_saturated
+        item.kinds = dict(self.kinds)
+        return item
+
+
+class StatsShard:
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.dropped = 0
+        self.items: Dict[StatsKey, PredicateStats] = {}
+        self.lock = threading.Lock()
+
+
+class WorkloadStats:
+    """
+    Aggregates compiled predicates by (field, path, operator, pattern shape).
+    Memory is bounded: at most max_keys predicate groups are tracked (others are counted
+    in dropped) and at most max_values distinct literals per group, stored as hashes.
+    Groups are spread over independently locked shards to keep recording
+    from concurrent threads cheap
+    """
+
+    def __init__(
+            self,
+            max_keys: int = DEFAULT_MAX_KEYS,
+            max_values: int = DEFAULT_MAX_VALUES,
+            shards: int = DEFAULT_STATS_SHARDS,
+    ):
+        if max_keys <= 0 or max_values <= 0 or shards <= 0:
+            raise ValueError("max_keys, max_values and shards must be positive")
+        shards = min(shards, max_keys)
+        self.max_keys = max_keys
+        self.max_values = max_values
+        self._shards = [StatsShard(max_keys // shards + (i < max_keys % shards)) for i in range(shards)]
+
+    def __len__(self) -> int:
+        return sum(len(x.items) for x in self._shards)
+
+    @property
+    def dropped(self) -> int:
+        return sum(x.dropped for x in self._shards)
+
+    def record(self, root: Node, fields: Mapping[str, Field]) -> None:
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.expression is not None:
+                self.record_expression(node.expression, fields)
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+
+    def record_expression(self, expression: Expression, fields: Mapping[str, Field]) -> None:
+        field = get_expression_field(expression, fields)
+        spl = expression.key.split(":")
+        path = ":".join(spl[1:]) if len(spl) > 1 else None
+        key = (spl[0], path, expression.operator, pattern_shape(expression, field))
+        value_hash = hash((type(expression.value), expression.value))
+        kind = value_kind(expression.value)
+        shard = self._shards[hash(key) % len(self._shards)]
+
+        with shard.lock:
+            item = shard.items.get(key)
+            if item is None:
+                if len(shard.items) >= shard.max_keys:
+                    shard.dropped += 1
+                    return
+                item = shard.items[key] = PredicateStats()
+            item.count += 1
+            item.kinds[kind] = item.kinds.get(kind, 0) + 1
+            if value_hash not in item.values:
+                if len(item.values) < self.max_values:
+                    item.values.add(value_hash)
+                else:
+                    item.values_saturated = True
+
+    def items(self) -> List[Tuple[StatsKey, PredicateStats]]:
+        """
+        Returns snapshot of recorded groups
+        """
+        result = []
+        for shard in self._shards:
+            with shard.lock:
+                result.extend((key, item.copy()) for key, item in shard.items.items())
+        return result
+
+    def clear(self) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                shard.items.clear()
+                shard.dropped = 0
+
+
+class Recommendation:
+
+    def __init__(self, kind: str, field: str, path: Optional[str], expression: str, ddl: str, count: int, reason: str):
+        self.kind = kind
+        self.field = field
+        self.path = path
+        self.expression = expression
+        self.ddl = ddl
+        self.count = count
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"Recommendation({self.kind!r}, {self.ddl!r}, count={self.count})"
+
+
+def object_name(*parts) -> str:
+    return NAME_SANITIZE_PATTERN.sub("_", "_".join(x for x in parts if x)).strip("_").lower()
+
+
+def index_recommendation(field: str, path: Optional[str], expression: str, index_type: str, count: int, reason: str):
+    name = object_name("idx", field, path, expression if expression != field else "", index_type.split("(")[0])
+    ddl = f"INDEX {name} {expression} TYPE {index_type} GRANULARITY {INDEX_GRANULARITY}"
+    return Recommendation("index", field, path, expression, ddl, count, reason)
+
+
+def materialized_type(kinds: Mapping[str, int]) -> Tuple[str, str]:
+    if kinds.get("string"):
+        return "String", "JSONExtractString"
+    if kinds.get("float"):
+        return "Float64", "JSONExtractFloat"
+    return "Int64", "JSONExtractInt"
+
+
+def recommend(
+        stats: WorkloadStats,
+        fields: Mapping[str, Field],
+        min_count: int = 1,
+) -> List[Recommendation]:
+    """
+    Returns data-skipping index and materialized column recommendations
+    for the recorded workload, most used first
+    """
+    groups: Dict[Tuple[str, Optional[str]], Dict[str, PredicateStats]] = {}
+    for (name, path, _, shape), item in stats.items():
+        shapes = groups.setdefault((name, path), {})
+        merged = shapes.setdefault(shape, PredicateStats())
+        merged.count += item.count
+        merged.values |= item.values
+        merged.values_saturated = merged.values_saturated or item.values_saturated
+        for kind, count in item.kinds.items():
+            merged.kinds[kind] = merged.kinds.get(kind, 0) + count
+
+    result = []
+    for (name, path), shapes in groups.items():
+        field = fields.get(name)
+        if field is None:
+            continue
+        total = sum(x.count for x in shapes.values())
+        if total < min_count:
+            continue
+
+        if path is None:
+            exact = shapes.get(SHAPE_EXACT)
+            if exact is not None:
+                if not exact.values_saturated and exact.cardinality <= SET_INDEX_MAX_CARDINALITY:
+                    index_type = f"set({SET_INDEX_MAX_CARDINALITY})"
+                    reason = f"equality with {exact.cardinality} distinct values"
+                else:
+                    index_type = "bloom_filter"
+                    reason = "equality with high cardinality values"
+                result.append(index_recommendation(field.name, None, field.name, index_type, exact.count, reason))
+            patterns = sum(shapes[x].count for x in PATTERN_SHAPES if x in shapes)
+            if patterns:
+                result.append(index_recommendation(
+                    field.name, None, field.name, NGRAM_INDEX_TYPE, patterns, "LIKE pattern search",
+                ))
+            if SHAPE_REGEX in shapes:
+                result.append(index_recommendation(
+                    field.name, None, field.name, TOKEN_INDEX_TYPE, shapes[SHAPE_REGEX].count, "regex search",
+                ))
+            if SHAPE_RANGE in shapes:
+                result.append(index_recommendation(
+                    field.name, None, field.name, "minmax", shapes[SHAPE_RANGE].count, "range comparison",
+                ))
+        elif field.path_key(path.split(":")) in field.path_aliases:
+            # already served by a separate column
+            continue
+        elif field.jsonstring:
+            column_type, extract = materialized_type(
+                {k: v for x in shapes.values() for k, v in x.kinds.items()}
+            )
+            json_path = ", ".join(escape_param(x) for x in path.split(":"))
+            expression = f"{extract}({field.name}, {json_path})"
+            column = object_name(field.name, path)
+            ddl = f"ADD COLUMN {column} {column_type} MATERIALIZED {expression}"
+            result.append(Recommendation(
+                "materialized_column", field.name, path, expression, ddl, total, "hot JSON path",
+            ))
+        elif field.is_map:
+            result.append(index_recommendation(
+                field.name, None, f"mapKeys({field.name})", "bloom_filter", total, "map key access",
+            ))
+            exact = shapes.get(SHAPE_EXACT)
+            if exact is not None:
+                result.append(index_recommendation(
+                    field.name, None, f"mapValues({field.name})", "bloom_filter", exact.count, "map value equality",
+                ))
+
+    merged_result: Dict[str, Recommendation] = {}
+    for item in result:
+        if item.ddl in merged_result:
+            merged_result[item.ddl].count += item.count
+        else:
+            merged_result[item.ddl] = item
+    return sorted(merged_result.values(), key=lambda x: (-x.count, x.ddl))
@@ -0,0 +1,228 @@
+import argparse
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from flyql.exceptions import FlyqlError
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+
+from .budget import Budget, BUDGET_ACTION_DOWNGRADE
+from .field import Field, PathAlias
+from .generator import to_sql, to_sql_with_aliases
+from .helpers import build_chain
+from .memo import CompileCache
+from .stats import WorkloadStats
+
+DEFAULT_WORKLOAD_SIZE = 200
+DEFAULT_ITERATIONS = 5
+DEFAULT_THREADS = (1, 2, 4, 8)
+
+# (key, operator, value, value_is_string)
+PREDICATES = (
+    ("message", Operator.EQUALS.value, "timeout", True),
+    ("message", Operator.EQUALS.value, "*timeout*", True),
+    ("message", Operator.EQUALS_REGEX.value, "time.*out", True),
+    ("service", Operator.EQUALS.value, "api", True),
+    ("service", Operator.NOT_EQUALS.value, "web", True),
+    ("status", Operator.GREATER_OR_EQUALS_THAN.value, 500, False),
+    ("duration", Operator.LOWER_THAN.value, 0.25, False),
+    ("payload:user:id", Operator.EQUALS.value, 42, False),
+    ("payload:user:name", Operator.EQUALS.value, "bob", True),
+    ("payload:http:method", Operator.EQUALS.value, "GET", True),
+    ("attrs:env", Operator.EQUALS.value, "prod", True),
+    ("attrs:region", Operator.EQUALS_REGEX.value, "eu-.*", True),
+    ("doc:status", Operator.EQUALS.value, 200, False),
+    ("doc:user:id", Operator.GREATER_THAN.value, 10, False),
+    ("doc:other", Operator.EQUALS.value, "x", True),
+)
+
+
+def stress_fields() -> Dict[str, Field]:
+    return {
+        "message": Field("message", False, "String"),
+        "service": Field("service", False, "LowCardinality(String)"),
+        "status": Field("status", False, "UInt16"),
+        "duration": Field("duration", False, "Float64"),
+        "payload": Field(
+            "payload", True, "String", path_aliases=[PathAlias("http:method", "http_method", "String")],
+        ),
+        "attrs": Field("attrs", False, "Map(String, String)", map_keys_indexed=True),
+        "doc": Field("doc", False, "JSON(status UInt16)", json_paths={"user.id": "Int64"}),
+    }
+
+
+def random_tree(rng: random.Random, depth: int) -> Node:
+    if depth == 0 or rng.random() < 0.3:
+        key, operator, value, value_is_string = rng.choice(PREDICATES)
+        return Node("", Expression(key, operator, value, value_is_string), None, None)
+    operands = [random_tree(rng, depth - 1) for _ in range(rng.randint(2, 4))]
+    return build_chain(rng.choice(("and", "or")), operands)
+
+
+def build_workload(size: int = DEFAULT_WORKLOAD_SIZE, seed: int = 0) -> List[Node]:
+    """
+    Returns reproducible list of mixed trees
+    """
+    rng = random.Random(seed)
+    return [random_tree(rng, rng.randint(0, 4)) for _ in range(size)]
+
+
+def compile_tree(
+        root: Node,
+        fields: Mapping[str, Field],
+        cache: Optional[CompileCache] = None,
+        stats: Optional[WorkloadStats] = None,
+) -> Tuple[str, ...]:
+    """
+    Returns outputs of every compilation mode for the tree
+    """
+    budget = Budget(max_total=64, action=BUDGET_ACTION_DOWNGRADE)
+    try:
+        budgeted = to_sql(root, fields, budget=budget)
+    except FlyqlError as err:
+        budgeted = f"error: {err}"
+    return (
+        to_sql(root, fields),
+        to_sql(root, fields, canonical=True),
+        to_sql(root, fields, cache=cache, stats=stats),
+        to_sql(root, fields, canonical=True, cache=cache),
+        "\n".join(to_sql_with_aliases(root, fields)),
+        budgeted,
+    )
+
+
+class RunResult:
+
+    def __init__(self, threads: int, elapsed: float, compiled: int, mismatches: int, errors: List[str]):
+        self.threads = threads
+        self.elapsed = elapsed
+        self.compiled = compiled
+        self.mismatches = mismatches
+        self.errors = errors
+
+    @property
+    def throughput(self) -> float:
+        return self.compiled / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def run_threads(
+        threads: int,
+        workload: Sequence[Node],
+        fields: Mapping[str, Field],
+        reference: Sequence[Tuple[str, ...]],
+        iterations: int = DEFAULT_ITERATIONS,
+        cache: Optional[CompileCache] = None,
+        stats: Optional[WorkloadStats] = None,
+) -> RunResult:
+    """
+    Compiles the workload iterations times from each of threads threads sharing
+    one cache and stats collector, and compares every output with reference
+    """
+    barrier = threading.Barrier(threads + 1)
+    lock = threading.Lock()
+    counters = {"compiled": 0, "mismatches": 0}
+    errors: List[str] = []
+
+    def worker(offset: int):
+        compiled = 0
+        mismatches = 0
+        barrier.wait()
+        try:
+            for _ in range(iterations):
+                for i in range(len(workload)):
+                    # threads start at different trees, so they contend on different cache keys
+                    index = (i + offset) % len(workload)
+                    if compile_tree(workload[index], fields, cache, stats) != reference[index]:
+                        mismatches += 1
+                    compiled += 1
+        except Exception as err:
+            with lock:
+                errors.append(repr(err))
+        with lock:
+            counters["compiled"] += compiled
+            counters["mismatches"] += mismatches
+
+    workers = [
+        threading.Thread(target=worker, args=(i * len(workload) // threads,), daemon=True)
+        for i in range(threads)
+    ]
+    for item in workers:
+        item.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for item in workers:
+        item.join()
+    elapsed = time.perf_counter() - started
+    return RunResult(threads, elapsed, counters["compiled"], counters["mismatches"], errors)
+
+
+def scaling_report(
+        thread_counts: Sequence[int] = DEFAULT_THREADS,
+        workload_size: int = DEFAULT_WORKLOAD_SIZE,
+        iterations: int = DEFAULT_ITERATIONS,
+        seed: int = 0,
+) -> List[Dict[str, float]]:
+    """
+    Returns throughput of the same per-thread work for each thread count,
+    with speedup and scaling efficiency (speedup / threads) relative to one thread
+    """
+    fields = stress_fields()
+    workload = build_workload(workload_size, seed)
+    reference = [compile_tree(x, fields) for x in workload]
+
+    rows = []
+    base = None
+    for threads in thread_counts:
+        result = run_threads(
+            threads, workload, fields, reference, iterations, cache=CompileCache(), stats=WorkloadStats(),
+        )
+        if result.errors or result.mismatches:
+            raise RuntimeError(
+                f"non-deterministic output with {threads} threads: "
+                f"{result.mismatches} mismatches, errors: {result.errors[:3]}"
+            )
+        if base is None:
+            base = result.throughput / threads
+        speedup = result.throughput / base if base else 0.0
+        rows.append({
+            "threads": threads,
+            "compiled": result.compiled,
+            "seconds": result.elapsed,
+            "throughput": result.throughput,
+            "speedup": speedup,
+            "efficiency": speedup / threads,
+        })
+    return rows
+
+
+def gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent compilation stress test and throughput benchmark")
+    parser.add_argument("--threads", default=",".join(str(x) for x in DEFAULT_THREADS),
+                        help="comma separated thread counts")
+    parser.add_argument("--workload-size", type=int, default=DEFAULT_WORKLOAD_SIZE)
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    thread_counts = [int(x) for x in args.threads.split(",")]
+    print(f"python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled() else 'disabled'}")
+    print(f"{'threads':>8} {'compiled':>10} {'seconds':>9} {'trees/s':>10} {'speedup':>8} {'efficiency':>11}")
+    for row in scaling_report(thread_counts, args.workload_size, args.iterations, args.seed):
+        print(
+            f"{row['threads']:>8} {row['compiled']:>10} {row['seconds']:>9.3f} {row['throughput']:>10.0f} "
+            f"{row['speedup']:>8.2f} {row['efficiency']:>10.0%}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import os
+
+from .benchmark import benchmark_cases, load_baseline, main, measure
+
+
+def test_cases_agree():
+    cases = benchmark_cases(size=16)
+    assert cases["to_sql"]() == cases["to_ir+render"]() == cases["cached"]()
+    cases["cached_edit"]()
+
+
+def test_measure():
+    timings = measure({"noop": lambda: None}, rounds=2, number=2)
+    assert set(timings) == {"noop"}
+    assert timings["noop"] >= 0
+
+
+def test_against_itself():
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    baseline = load_baseline(path)
+    cases = benchmark_cases(size=16, baseline=baseline)
+    assert cases["baseline"]() == cases["to_sql"]()
+    assert main(["--size", "16", "--rounds", "1", "--number", "1", "--baseline", path, "--max-ratio", "1000"]) == 0
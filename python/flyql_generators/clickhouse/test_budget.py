@@ -0,0 +1,80 @@
+import pytest
+from flyql.exceptions import FlyqlError
+from flyql.constants import Operator
+from flyql.tree import Node
+from .budget import Budget, BUDGET_ACTION_DOWNGRADE, apply_budget
+from .cost import estimate_cost
+from .generator import to_sql
+from .testing import leaf
+
+
+@pytest.fixture
+def regex_first():
+    return Node(
+        "and",
+        None,
+        leaf("message", Operator.EQUALS_REGEX.value, "timeout"),
+        leaf("service", Operator.EQUALS.value, "api"),
+    )
+
+
+class TestBudget:
+
+    def test_within_budget(self, fields, regex_first):
+        assert Budget(max_total=100, max_regexes=1).violations(estimate_cost(regex_first, fields)) == []
+
+    def test_violations(self, fields, regex_first):
+        budget = Budget(max_total=10, max_predicates=1, max_regexes=0)
+        assert budget.violations(estimate_cost(regex_first, fields)) == [
+            "total 33 > 10",
+            "predicates 2 > 1",
+            "regexes 1 > 0",
+        ]
+
+    def test_unknown_action(self):
+        with pytest.raises(FlyqlError, match="unknown budget action"):
+            Budget(action="ignore")
+
+
+class TestApplyBudget:
+
+    def test_refuse(self, fields, regex_first):
+        with pytest.raises(FlyqlError, match="query exceeds complexity budget: total 33 > 20"):
+            apply_budget(regex_first, fields, Budget(max_total=20))
+
+    def test_refuse_json_parses(self, fields):
+        root = leaf("payload:user:id", Operator.EQUALS.value, "1")
+        with pytest.raises(FlyqlError, match="json_parses 8 > 4"):
+            apply_budget(root, fields, Budget(max_json_parses=4))
+
+    def test_downgrade_reorders(self, fields, regex_first):
+        budget = Budget(max_total=20, action=BUDGET_ACTION_DOWNGRADE)
+        root, estimate = apply_budget(regex_first, fields, budget)
+        assert estimate.total == 33
+        assert to_sql(root, fields) == "(service = 'api' and match(message, 'timeout'))"
+
+    def test_downgrade_still_over_budget(self, fields, regex_first):
+        budget = Budget(max_total=5, action=BUDGET_ACTION_DOWNGRADE)
+        with pytest.raises(FlyqlError, match="query exceeds complexity budget"):
+            apply_budget(regex_first, fields, budget)
+
+    def test_downgrade_count_limits_are_hard(self, fields, regex_first):
+        budget = Budget(max_regexes=0, action=BUDGET_ACTION_DOWNGRADE)
+        with pytest.raises(FlyqlError, match="regexes 1 > 0"):
+            apply_budget(regex_first, fields, budget)
+
+    def test_untouched_within_budget(self, fields, regex_first):
+        budget = Budget(max_total=100, action=BUDGET_ACTION_DOWNGRADE)
+        root, _ = apply_budget(regex_first, fields, budget)
+        assert root is regex_first
+
+
+class TestToSQLBudget:
+
+    def test_to_sql_refuses(self, fields, regex_first):
+        with pytest.raises(FlyqlError, match="query exceeds complexity budget"):
+            to_sql(regex_first, fields, budget=Budget(max_regexes=0))
+
+    def test_to_sql_downgrades(self, fields, regex_first):
+        result = to_sql(regex_first, fields, budget=Budget(max_total=20, action=BUDGET_ACTION_DOWNGRADE))
+        assert result == "(service = 'api' and match(message, 'timeout'))"
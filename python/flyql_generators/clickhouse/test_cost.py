@@ -0,0 +1,96 @@
+import pytest
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+from .field import Field, PathAlias
+from .cost import (
+    COST_COMPARE,
+    COST_MAP_ACCESS,
+    COST_JSON_DYNAMIC_ACCESS,
+    COST_LIKE,
+    COST_JSON_EXTRACT,
+    COST_REGEX,
+    estimate_cost,
+    expression_cost,
+)
+from .testing import leaf
+
+
+@pytest.fixture
+def fields(fields):
+    return dict(fields, payload=Field("payload", True, "String", path_aliases=[PathAlias("user:id", "user_id", "Int64")]))
+
+
+@pytest.mark.parametrize("key,operator,value,expected", [
+    ("message", Operator.EQUALS.value, "hello", COST_COMPARE),
+    ("count", Operator.GREATER_THAN.value, 1, COST_COMPARE),
+    ("message", Operator.EQUALS.value, "hello*", COST_LIKE),
+    ("message", Operator.NOT_EQUALS_REGEX.value, "h.*", COST_REGEX),
+    ("payload:a", Operator.EQUALS.value, "x", COST_JSON_EXTRACT + COST_COMPARE),
+    ("payload:a", Operator.EQUALS_REGEX.value, "x", COST_JSON_EXTRACT + COST_REGEX),
+    ("doc:status", Operator.EQUALS.value, 200, COST_COMPARE),
+    ("doc:other", Operator.EQUALS.value, "x*", COST_JSON_DYNAMIC_ACCESS + COST_COMPARE),
+    ("attrs:env", Operator.EQUALS.value, "x*", COST_MAP_ACCESS + COST_COMPARE),
+    ("tags:0", Operator.EQUALS.value, "x", COST_MAP_ACCESS + COST_COMPARE),
+    ("unknown", Operator.EQUALS.value, "x", COST_COMPARE),
+    ("payload:user:id", Operator.EQUALS.value, 1, COST_COMPARE),
+    ("payload:user:id", Operator.NOT_EQUALS.value, 1, COST_JSON_EXTRACT + COST_COMPARE),
+])
+def test_expression_cost(fields, key, operator, value, expected):
+    expression = Expression(key, operator, value, isinstance(value, str))
+    assert expression_cost(expression, fields) == expected
+
+
+def test_cost_ranking_order():
+    assert COST_COMPARE < COST_MAP_ACCESS < COST_LIKE < COST_JSON_EXTRACT < COST_REGEX
+
+
+class TestEstimateCost:
+
+    def test_breakdown(self, fields):
+        root = Node(
+            "and",
+            None,
+            Node(
+                "or",
+                None,
+                leaf("message", Operator.EQUALS_REGEX.value, "a.*"),
+                leaf("message", Operator.EQUALS.value, "*err"),
+            ),
+            Node(
+                "and",
+                None,
+                leaf("payload:user:ip", Operator.EQUALS.value, 1),
+                leaf("attrs:env", Operator.EQUALS.value, "prod"),
+            ),
+        )
+        estimate = estimate_cost(root, fields)
+        assert estimate.breakdown() == {
+            "total": COST_REGEX + COST_LIKE + COST_JSON_EXTRACT + COST_COMPARE + COST_MAP_ACCESS + COST_COMPARE,
+            "predicates": 4,
+            "regexes": 1,
+            "json_parses": 8,
+            "map_scans": 1,
+            "leading_wildcard_likes": 1,
+        }
+
+    def test_json_string_value_parses(self, fields):
+        estimate = estimate_cost(leaf("payload:name", Operator.EQUALS.value, "x"), fields)
+        assert estimate.json_parses == 2
+
+    def test_trailing_wildcard_not_leading(self, fields):
+        estimate = estimate_cost(leaf("message", Operator.EQUALS.value, "err*"), fields)
+        assert estimate.leading_wildcard_likes == 0
+
+    def test_map_literal_star_not_like(self, fields):
+        estimate = estimate_cost(leaf("attrs:env", Operator.EQUALS.value, "*x"), fields)
+        assert estimate.leading_wildcard_likes == 0
+
+    def test_alias_fallback_path(self, fields):
+        estimate = estimate_cost(leaf("payload:user:id", Operator.EQUALS.value, "abc"), fields)
+        assert estimate.json_parses == 2
+
+    def test_aliased_path(self, fields):
+        estimate = estimate_cost(leaf("payload:user:id", Operator.EQUALS.value, 1), fields)
+        assert estimate.json_parses == 0
+        assert estimate.total == COST_COMPARE
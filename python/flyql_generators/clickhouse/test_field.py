@@ -1,5 +1,5 @@
 import pytest
-from .field import Field, normalize_clickhouse_type
+from .field import Field, PathAlias, normalize_clickhouse_type, parse_json_type_paths
 
 
 @pytest.mark.parametrize("input_type,expected", [
@@ -38,6 +38,19 @@ def test_normalize_clickhouse_type(input_type, expected):
     assert result == expected
 
 
+@pytest.mark.parametrize("input_type,expected", [
+    ("JSON", {}),
+    ("JSON(a.b UInt32)", {"a.b": "UInt32"}),
+    ("json(a.b UInt32, c Decimal(10, 2))", {"a.b": "UInt32", "c": "Decimal(10, 2)"}),
+    ("JSON(max_dynamic_paths=10, a String, SKIP b, SKIP REGEXP 'c.*')", {"a": "String"}),
+    ("JSON(`a b` Array(Nullable(String)))", {"a b": "Array(Nullable(String))"}),
+    ("String", {}),
+    ("", {}),
+])
+def test_parse_json_type_paths(input_type, expected):
+    assert parse_json_type_paths(input_type) == expected
+
+
 class TestField:
 
     def test_field_creation_basic(self):
@@ -67,6 +80,16 @@ class TestField:
         assert field.is_map is True
         assert field.is_array is False
 
+    def test_field_creation_map_indexes(self):
+        field = Field("map_field", False, "Map(String, String)", map_keys_indexed=True, map_values_indexed=True)
+        assert field.map_keys_indexed is True
+        assert field.map_values_indexed is True
+
+    def test_field_creation_map_indexes_default(self):
+        field = Field("map_field", False, "Map(String, String)")
+        assert field.map_keys_indexed is False
+        assert field.map_values_indexed is False
+
     def test_field_creation_array(self):
         field = Field("array_field", False, "Array(String)")
         assert field.normalized_type == "array"
@@ -104,6 +127,33 @@ class TestField:
         assert field.normalized_type == "json"
         assert field.is_json is True
 
+    def test_field_creation_json_paths(self):
+        field = Field("json_field", False, "JSON(a.b UInt32)", json_paths={"c": "Int64"})
+        assert field.json_typed_paths == {"a.b": "UInt32"}
+        assert field.json_paths == {"c": "Int64"}
+
+    def test_field_creation_json_paths_default(self):
+        field = Field("json_field", False, "String")
+        assert field.json_typed_paths == {}
+        assert field.json_paths == {}
+
+    def test_field_creation_path_aliases(self):
+        alias = PathAlias("user:id", "user_id", "Nullable(Int64)")
+        field = Field("payload", True, "String", path_aliases=[alias])
+        assert field.path_aliases == {"user:id": alias}
+        assert alias.normalized_type == "int"
+
+    def test_field_path_key(self):
+        assert Field("payload", True, "String").path_key(["a", "b"]) == "a:b"
+        assert Field("doc", False, "JSON").path_key(["a", "b"]) == "a.b"
+        field = Field("doc", False, "JSON", path_aliases=[PathAlias("a:b", "ab", "String")])
+        assert list(field.path_aliases) == ["a.b"]
+
+    def test_field_cache_key_includes_aliases(self):
+        field = Field("payload", True, "String")
+        aliased = Field("payload", True, "String", path_aliases=[PathAlias("a", "a", "String")])
+        assert field.cache_key() != aliased.cache_key()
+
     def test_field_values_empty_list(self):
         field = Field("test", False, "String", [])
         assert field.values == []
@@ -3,14 +3,17 @@ from flyql.exceptions import FlyqlError
 from flyql.expression import Expression
 from flyql.constants import Operator
 from flyql.tree import Node
-from .field import Field
+from .field import Field, PathAlias
 from .generator import (
     expression_to_sql,
     to_sql,
+    to_sql_with_aliases,
+    fingerprint,
     escape_param,
     is_number,
     prepare_like_pattern_value
 )
+from .testing import leaf
 
 
 @pytest.fixture
@@ -203,6 +206,176 @@ class TestNewJSONFields:
         assert result == 'new_json._private = \'test\''
 
 
+class TestNewJSONTypedPaths:
+
+    @pytest.fixture
+    def json_fields(self):
+        return {
+            "doc": Field(
+                "doc",
+                False,
+                "JSON(status UInt16, user.name String, max_dynamic_paths=64, SKIP debug)",
+                json_paths={"user.id": "Int64", "score": "Float64", "ok": "Bool", "tags": "Array(String)"},
+            ),
+        }
+
+    def test_declared_path_int(self, json_fields):
+        expr = Expression("doc:status", Operator.EQUALS.value, 200, False)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.status = 200"
+
+    def test_declared_path_string_literal(self, json_fields):
+        expr = Expression("doc:user:name", Operator.EQUALS.value, "jo*", True)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.user.name = 'jo*'"
+
+    def test_hinted_path_string_literal(self, json_fields):
+        fields = dict(json_fields, doc=Field("doc", False, "JSON", json_paths={"t": "String"}))
+        expr = Expression("doc:t", Operator.EQUALS.value, "x*", True)
+        assert expression_to_sql(expr, fields) == "doc.t.:String = 'x*'"
+        assert expression_to_sql(Expression("doc:other", Operator.EQUALS.value, "x*", True), fields) == "doc.other = 'x*'"
+
+    def test_hinted_path_int(self, json_fields):
+        expr = Expression("doc:user:id", Operator.GREATER_THAN.value, 10, False)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.user.id.:Int64 > 10"
+
+    def test_hinted_path_int_string_value(self, json_fields):
+        expr = Expression("doc:user:id", Operator.EQUALS.value, "42", True)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.user.id.:Int64 = 42"
+
+    def test_hinted_path_float(self, json_fields):
+        expr = Expression("doc:score", Operator.LOWER_THAN.value, 0.5, False)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.score.:Float64 < 0.5"
+
+    def test_hinted_path_bool(self, json_fields):
+        expr = Expression("doc:ok", Operator.EQUALS.value, "true", True)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.ok.:Bool = true"
+
+    def test_hinted_path_complex_type_quoted(self, json_fields):
+        expr = Expression("doc:tags", Operator.NOT_EQUALS.value, "x", True)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.tags.:`Array(String)` != 'x'"
+
+    def test_hinted_path_other_type_value_falls_back(self, json_fields):
+        expr = Expression("doc:user:id", Operator.EQUALS.value, "abc", True)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.user.id = 'abc'"
+
+    def test_hinted_path_other_type_operation_falls_back(self, json_fields):
+        expr = Expression("doc:user:id", Operator.EQUALS_REGEX.value, "1.*", True)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "match(doc.user.id, '1.*')"
+
+    def test_unknown_path_regex(self, json_fields):
+        expr = Expression("doc:other", Operator.NOT_EQUALS_REGEX.value, "^a", True)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "not match(doc.other, '^a')"
+
+    def test_declared_path_invalid_value(self, json_fields):
+        expr = Expression("doc:status", Operator.EQUALS.value, "abc", True)
+        with pytest.raises(FlyqlError, match="invalid value"):
+            expression_to_sql(expr, json_fields)
+
+    def test_unknown_path_fallback(self, json_fields):
+        expr = Expression("doc:other", Operator.EQUALS.value, "test", True)
+        result = expression_to_sql(expr, json_fields)
+        assert result == "doc.other = 'test'"
+
+
+class TestPathAliases:
+
+    @pytest.fixture
+    def alias_fields(self):
+        return {
+            "payload": Field(
+                "payload",
+                True,
+                "String",
+                path_aliases=[
+                    PathAlias("user:id", "payload_user_id", "Int64"),
+                    PathAlias("http:method", "http_method", "LowCardinality(String)"),
+                ],
+            ),
+            "doc": Field("doc", False, "JSON", path_aliases=[PathAlias("user:name", "user_name", "String")]),
+            "attrs": Field("attrs", False, "Map(String, String)", path_aliases=[PathAlias("env", "env", "String")]),
+        }
+
+    def test_jsonstring_path_to_int_column(self, alias_fields):
+        expr = Expression("payload:user:id", Operator.EQUALS.value, 42, False)
+        assert expression_to_sql(expr, alias_fields) == "payload_user_id = 42"
+
+    def test_jsonstring_path_to_string_column(self, alias_fields):
+        expr = Expression("payload:http:method", Operator.EQUALS.value, "PO*", True)
+        assert expression_to_sql(expr, alias_fields) == "http_method = 'PO*'"
+
+    def test_regex_on_alias(self, alias_fields):
+        expr = Expression("payload:http:method", Operator.EQUALS_REGEX.value, "^G", True)
+        assert expression_to_sql(expr, alias_fields) == "match(http_method, '^G')"
+
+    @pytest.mark.parametrize("operator,expected", [
+        (Operator.GREATER_THAN.value, "payload_user_id > 5"),
+        (Operator.LOWER_THAN.value, "payload_user_id < 5"),
+    ])
+    def test_ordered_comparison_on_alias(self, alias_fields, operator, expected):
+        expr = Expression("payload:user:id", operator, 5, False)
+        assert expression_to_sql(expr, alias_fields) == expected
+
+    @pytest.mark.parametrize("key,operator,value", [
+        ("payload:user:id", Operator.NOT_EQUALS.value, 5),
+        ("payload:user:id", Operator.EQUALS.value, 0),
+        ("payload:http:method", Operator.NOT_EQUALS.value, "GET"),
+        ("payload:http:method", Operator.NOT_EQUALS_REGEX.value, "^G"),
+    ])
+    def test_comparison_matching_default_falls_back(self, alias_fields, key, operator, value):
+        expr = Expression(key, operator, value, isinstance(value, str))
+        assert "multiIf(JSONType(payload" in expression_to_sql(expr, alias_fields)
+
+    def test_native_json_comparison_matching_default_falls_back(self, alias_fields):
+        expr = Expression("doc:user.name", Operator.NOT_EQUALS.value, "bob", True)
+        assert expression_to_sql(expr, alias_fields) == "doc.user.name != 'bob'"
+
+    def test_map_comparison_matching_default_on_alias(self, alias_fields):
+        expr = Expression("attrs:env", Operator.NOT_EQUALS.value, "prod", True)
+        assert expression_to_sql(expr, alias_fields) == "env != 'prod'"
+
+    def test_operation_not_fitting_alias_falls_back(self, alias_fields):
+        expr = Expression("payload:user:id", Operator.EQUALS_REGEX.value, "^4", True)
+        result = expression_to_sql(expr, alias_fields)
+        assert result == (
+            "multiIf(JSONType(payload, 'user', 'id') = 'String', "
+            "match(JSONExtractString(payload, 'user', 'id'), '^4'),0)"
+        )
+
+    def test_value_not_fitting_alias_falls_back(self, alias_fields):
+        expr = Expression("payload:user:id", Operator.EQUALS.value, "abc", True)
+        result = expression_to_sql(expr, alias_fields)
+        assert result == (
+            "multiIf(JSONType(payload, 'user', 'id') = 'String', "
+            "equals(JSONExtractString(payload, 'user', 'id'), 'abc'),0)"
+        )
+
+    def test_unmapped_path_falls_back(self, alias_fields):
+        expr = Expression("payload:user:name", Operator.EQUALS.value, "bob", True)
+        result = expression_to_sql(expr, alias_fields)
+        assert result.startswith("multiIf(JSONType(payload, 'user', 'name')")
+
+    def test_native_json_dotted_path(self, alias_fields):
+        expr = Expression("doc:user.name", Operator.EQUALS.value, "bob", True)
+        assert expression_to_sql(expr, alias_fields) == "user_name = 'bob'"
+
+    def test_map_key(self, alias_fields):
+        expr = Expression("attrs:env", Operator.EQUALS.value, "prod", True)
+        assert expression_to_sql(expr, alias_fields) == "env = 'prod'"
+
+    def test_map_key_literal(self, alias_fields):
+        expr = Expression("attrs:env", Operator.EQUALS.value, "prod*", True)
+        assert expression_to_sql(expr, alias_fields) == "env = 'prod*'"
+
+
 class TestJSONFieldValidationErrors:
 
     def test_json_field_with_quotes(self, fields):
@@ -270,6 +443,49 @@ class TestMapFields:
         result = expression_to_sql(expr, fields)
         assert result == "equals(metadata['nested:key'], 'value')"
 
+    def test_map_field_key_escaped(self, fields):
+        expr = Expression("metadata:it's", Operator.EQUALS.value, "value", True)
+        result = expression_to_sql(expr, fields)
+        assert result == "equals(metadata['it\\'s'], 'value')"
+
+    def test_map_field_keys_index_prefilter(self):
+        fields = {"attrs": Field("attrs", False, "Map(String, String)", map_keys_indexed=True)}
+        expr = Expression("attrs:env", Operator.EQUALS.value, "prod", True)
+        result = expression_to_sql(expr, fields)
+        assert result == "(mapContains(attrs, 'env') and equals(attrs['env'], 'prod'))"
+
+    def test_map_field_values_index_prefilter(self):
+        fields = {"attrs": Field("attrs", False, "Map(String, String)", map_values_indexed=True)}
+        expr = Expression("attrs:env", Operator.EQUALS.value, "prod", True)
+        result = expression_to_sql(expr, fields)
+        assert result == "(has(mapValues(attrs), 'prod') and equals(attrs['env'], 'prod'))"
+
+    def test_map_field_both_index_prefilters(self):
+        fields = {
+            "attrs": Field("attrs", False, "Map(String, String)", map_keys_indexed=True, map_values_indexed=True),
+        }
+        expr = Expression("attrs:env", Operator.EQUALS.value, "prod", True)
+        result = expression_to_sql(expr, fields)
+        assert result == (
+            "(mapContains(attrs, 'env') and has(mapValues(attrs), 'prod') and equals(attrs['env'], 'prod'))"
+        )
+
+    @pytest.mark.parametrize("operator,value,value_is_string", [
+        (Operator.NOT_EQUALS.value, "prod", True),
+        (Operator.EQUALS_REGEX.value, "prod.*", True),
+        (Operator.NOT_EQUALS_REGEX.value, "prod.*", True),
+        (Operator.EQUALS.value, "", True),
+        (Operator.EQUALS.value, 0, False),
+    ])
+    def test_map_field_no_prefilter(self, operator, value, value_is_string):
+        fields = {
+            "attrs": Field("attrs", False, "Map(String, String)", map_keys_indexed=True, map_values_indexed=True),
+        }
+        expr = Expression("attrs:env", operator, value, value_is_string)
+        result = expression_to_sql(expr, fields)
+        assert "mapContains" not in result
+        assert "mapValues" not in result
+
 
 class TestArrayFields:
 
@@ -330,6 +546,129 @@ class TestTreeToSQL:
         assert result == "((message = 'hello' and count > 10.0) or active = '1.0')"
 
 
+class TestCanonicalSQL:
+
+    def test_commutative_operands_sorted(self, fields):
+        a = leaf("message", Operator.EQUALS.value, "hello")
+        b = leaf("count", Operator.GREATER_THAN.value, 10, False)
+        first = to_sql(Node("and", None, a, b), fields, canonical=True)
+        second = to_sql(Node("and", None, b, a), fields, canonical=True)
+        assert first == second == "(count > 10 and message = 'hello')"
+
+    def test_associative_chain_flattened(self, fields):
+        a = leaf("message", Operator.EQUALS.value, "a")
+        b = leaf("message", Operator.EQUALS.value, "b")
+        c = leaf("message", Operator.EQUALS.value, "c")
+        left_deep = Node("or", None, Node("or", None, a, b), c)
+        right_deep = Node("or", None, c, Node("", None, Node("or", None, b, a), None))
+        expected = "(message = 'a' or message = 'b' or message = 'c')"
+        assert to_sql(left_deep, fields, canonical=True) == expected
+        assert to_sql(right_deep, fields, canonical=True) == expected
+
+    def test_mixed_operators_keep_grouping(self, fields):
+        a = leaf("message", Operator.EQUALS.value, "a")
+        b = leaf("message", Operator.EQUALS.value, "b")
+        c = leaf("count", Operator.EQUALS.value, 1, False)
+        root = Node("and", None, Node("or", None, b, a), c)
+        result = to_sql(root, fields, canonical=True)
+        assert result == "((message = 'a' or message = 'b') and count = '1.0')"
+
+    def test_duplicates_removed(self, fields):
+        a = leaf("message", Operator.EQUALS.value, "a")
+        b = leaf("count", Operator.LOWER_THAN.value, 5, False)
+        root = Node("and", None, Node("and", None, a, b), leaf("message", Operator.EQUALS.value, "a"))
+        assert to_sql(root, fields, canonical=True) == "(count < 5 and message = 'a')"
+
+    def test_duplicates_collapse_to_single_operand(self, fields):
+        a = leaf("message", Operator.EQUALS.value, "a")
+        root = Node("or", None, a, leaf("message", Operator.EQUALS.value, "a"))
+        assert to_sql(root, fields, canonical=True) == "message = 'a'"
+
+    def test_literals_normalized(self, fields):
+        assert to_sql(leaf("price", Operator.GREATER_THAN.value, 10, False), fields, canonical=True) == "price > 10"
+        assert to_sql(leaf("price", Operator.GREATER_THAN.value, "10.0", False), fields, canonical=True) == "price > 10"
+        assert to_sql(leaf("price", Operator.GREATER_THAN.value, 10.5, False), fields, canonical=True) == "price > 10.5"
+
+    def test_json_number_branches_normalized(self, fields):
+        result = to_sql(leaf("json_field:age", Operator.EQUALS.value, 25, False), fields, canonical=True)
+        assert "equals(JSONExtractString(json_field, 'age'), 25.0)" in result
+        assert "equals(JSONExtractInt(json_field, 'age'), 25)" in result
+
+    @pytest.mark.parametrize("key,operator,value", [
+        ("message", Operator.EQUALS.value, 10.0),
+        ("message", Operator.NOT_EQUALS.value, 10),
+        ("count", Operator.EQUALS.value, 1),
+        ("active", Operator.EQUALS.value, True),
+        ("metadata:env", Operator.EQUALS.value, 10),
+        ("tags:0", Operator.EQUALS.value, 10),
+        ("new_json:a", Operator.EQUALS.value, 10),
+    ])
+    def test_string_comparison_same_as_plain(self, fields, key, operator, value):
+        root = leaf(key, operator, value, False)
+        assert to_sql(root, fields, canonical=True) == to_sql(root, fields)
+
+    def test_original_value_validated(self, fields):
+        root = leaf("active", Operator.LOWER_THAN.value, True, False)
+        # parsers may keep boolean literals as bool
+        root.expression.value = True
+        with pytest.raises(FlyqlError, match="operation not allowed"):
+            to_sql(root, fields)
+        with pytest.raises(FlyqlError, match="operation not allowed"):
+            to_sql(root, fields, canonical=True)
+
+    def test_default_mode_unchanged(self, fields):
+        a = leaf("message", Operator.EQUALS.value, "hello")
+        b = leaf("count", Operator.GREATER_THAN.value, 10, False)
+        assert to_sql(Node("and", None, a, b), fields) == "(message = 'hello' and count > 10.0)"
+
+    def test_fingerprint(self, fields):
+        a = leaf("message", Operator.EQUALS.value, "hello")
+        b = leaf("count", Operator.GREATER_THAN.value, 10, False)
+        first = fingerprint(to_sql(Node("and", None, a, b), fields, canonical=True))
+        second = fingerprint(to_sql(Node("and", None, b, a), fields, canonical=True))
+        assert first == second
+        assert len(first) == 64
+        assert first != fingerprint(to_sql(Node("or", None, a, b), fields, canonical=True))
+
+
+class TestAccessAliases:
+
+    def test_repeated_json_path(self, fields):
+        left = Node("", Expression("json_field:user:id", Operator.EQUALS.value, "a", True), None, None)
+        right = Node("", Expression("json_field:user:id", Operator.EQUALS.value, "b", True), None, None)
+        with_clause, result = to_sql_with_aliases(Node("or", None, left, right), fields)
+        assert with_clause == (
+            "WITH JSONType(json_field, 'user', 'id') AS _fq_0, "
+            "JSONExtractString(json_field, 'user', 'id') AS _fq_1"
+        )
+        assert result == (
+            "(multiIf(_fq_0 = 'String', equals(_fq_1, 'a'),0) or "
+            "multiIf(_fq_0 = 'String', equals(_fq_1, 'b'),0))"
+        )
+
+    def test_json_type_repeated_within_expression(self, fields):
+        node = Node("", Expression("json_field:age", Operator.EQUALS.value, 25, False), None, None)
+        with_clause, result = to_sql_with_aliases(node, fields)
+        assert with_clause == "WITH JSONType(json_field, 'age') AS _fq_0"
+        assert result.count("_fq_0") == 4
+        assert "JSONExtractInt(json_field, 'age')" in result
+
+    def test_repeated_map_key(self, fields):
+        left = Node("", Expression("metadata:env", Operator.EQUALS.value, "prod", True), None, None)
+        right = Node("", Expression("metadata:env", Operator.EQUALS_REGEX.value, "st.*", True), None, None)
+        with_clause, result = to_sql_with_aliases(Node("or", None, left, right), fields)
+        assert with_clause == "WITH metadata['env'] AS _fq_0"
+        assert result == "(equals(_fq_0, 'prod') or match(_fq_0, 'st.*'))"
+
+    def test_nothing_repeated(self, fields):
+        left = Node("", Expression("metadata:env", Operator.EQUALS.value, "prod", True), None, None)
+        right = Node("", Expression("message", Operator.EQUALS.value, "hello", True), None, None)
+        root = Node("and", None, left, right)
+        with_clause, result = to_sql_with_aliases(root, fields)
+        assert with_clause == ""
+        assert result == to_sql(root, fields)
+
+
 @pytest.mark.parametrize("field_name,operator,value,value_is_string,expected", [
     ("message", Operator.EQUALS.value, "test", True, "message = 'test'"),
     ("count", Operator.NOT_EQUALS.value, 42, False, "count != '42.0'"),
@@ -1,10 +1,16 @@
 import pytest
 from flyql.exceptions import FlyqlError
 from flyql.constants import Operator
+from flyql.tree import Node
 from .helpers import (
+    build_chain,
+    flatten,
     get_value_type,
-    validate_operation
+    matches_default_value,
+    validate_operation,
+    value_fits_type,
 )
+from .testing import leaf
 
 
 @pytest.mark.parametrize("value,expected", [
@@ -60,4 +66,68 @@ def test_validate_operation_forbidden(value, field_normalized_type, operator):
 def test_validate_operation_unknown_type():
     # unknown type bypass
     validate_operation("test", None, Operator.EQUALS.value)
-    validate_operation(123, "unknown_type", Operator.GREATER_THAN.value)
\ No newline at end of file
+    validate_operation(123, "unknown_type", Operator.GREATER_THAN.value)
+
+
+class TestFlatten:
+
+    def test_flatten_left_deep(self):
+        a, b, c = leaf("a"), leaf("b"), leaf("c")
+        assert flatten(build_chain("and", [a, b, c]), "and") == [a, b, c]
+
+    def test_flatten_stops_at_other_operator(self):
+        a, b, c = leaf("a"), leaf("b"), leaf("c")
+        inner = build_chain("or", [b, c])
+        assert flatten(build_chain("and", [a, inner]), "and") == [a, inner]
+
+    def test_flatten_unwraps_single_child(self):
+        a, b = leaf("a"), leaf("b")
+        wrapped = Node("", None, build_chain("and", [a, b]), None)
+        assert flatten(wrapped, "and") == [a, b]
+
+    def test_flatten_single_expression(self):
+        a = leaf("a")
+        assert flatten(a, "and") == [a]
+
+
+def test_build_chain_left_deep():
+    a, b, c = leaf("a"), leaf("b"), leaf("c")
+    root = build_chain("or", [a, b, c])
+    assert root.bool_operator == "or"
+    assert root.right is c
+    assert root.left.left is a
+    assert root.left.right is b
+
+
+@pytest.mark.parametrize("value,normalized_type,operator,expected", [
+    ("42", "int", Operator.EQUALS.value, True),
+    ("abc", "int", Operator.EQUALS.value, False),
+    ("^4", "int", Operator.EQUALS_REGEX.value, False),
+    ("^4", "string", Operator.EQUALS_REGEX.value, True),
+    ("true", "bool", Operator.EQUALS.value, True),
+    ("yes", "bool", Operator.EQUALS.value, False),
+    ("abc", "string", Operator.NOT_EQUALS.value, True),
+])
+def test_value_fits_type(value, normalized_type, operator, expected):
+    assert value_fits_type(value, normalized_type, operator) is expected
+
+
+@pytest.mark.parametrize("value,normalized_type,operator,expected", [
+    (5, "int", Operator.EQUALS.value, False),
+    (5, "int", Operator.GREATER_THAN.value, False),
+    (5, "int", Operator.NOT_EQUALS.value, True),
+    (5, "int", Operator.LOWER_THAN.value, True),
+    ("0", "float", Operator.EQUALS.value, True),
+    ("true", "bool", Operator.EQUALS.value, False),
+    ("false", "bool", Operator.EQUALS.value, True),
+    ("a", "string", Operator.EQUALS.value, False),
+    ("", "string", Operator.EQUALS.value, True),
+    ("a", "string", Operator.NOT_EQUALS.value, True),
+    ("^a", "string", Operator.EQUALS_REGEX.value, False),
+    (".*", "string", Operator.EQUALS_REGEX.value, True),
+    ("^a", "string", Operator.NOT_EQUALS_REGEX.value, True),
+    ("(", "string", Operator.EQUALS_REGEX.value, True),
+    ("2020-01-01", "date", Operator.EQUALS.value, True),
+])
+def test_matches_default_value(value, normalized_type, operator, expected):
+    assert matches_default_value(value, normalized_type, operator) is expected
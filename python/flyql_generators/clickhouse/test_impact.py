@@ -0,0 +1,95 @@
+import pytest
+from flyql.tree import Node
+from .field import Field, PathAlias
+from .impact import ImpactIndex, diff_schemas, references
+from .testing import leaf
+
+
+def either(*nodes):
+    root = nodes[0]
+    for node in nodes[1:]:
+        root = Node("or", None, root, node)
+    return root
+
+
+@pytest.fixture
+def index(fields):
+    index = ImpactIndex()
+    index.compile("q_message", leaf("message"), fields)
+    index.compile("q_payload", either(leaf("payload:user:id"), leaf("payload:http:status")), fields)
+    index.compile("q_doc_user", leaf("doc:user:id", value="1"), fields)
+    index.compile("q_doc_status", leaf("doc:status", value="200"), fields)
+    index.compile("q_attrs", either(leaf("attrs:env"), leaf("message")), fields)
+    return index
+
+
+def test_references(fields):
+    root = either(leaf("message"), leaf("payload:user:id"), leaf("doc:user:id"), leaf("doc:user.id"))
+    assert references(root, fields) == {
+        ("message", None),
+        ("payload", "user:id"),
+        ("doc", "user.id"),
+    }
+
+
+class TestDiffSchemas:
+
+    def test_no_changes(self, fields):
+        assert diff_schemas(fields, dict(fields)) == set()
+
+    def test_dropped_and_added(self, fields):
+        new = dict(fields, level=Field("level", False, "String"))
+        del new["message"]
+        assert diff_schemas(fields, new) == {("message", None), ("level", None)}
+
+    def test_type_change(self, fields):
+        new = dict(fields, message=Field("message", False, "LowCardinality(String)"))
+        assert diff_schemas(fields, new) == {("message", None)}
+
+    def test_json_path_hint_change(self, fields):
+        new = dict(fields, doc=Field("doc", False, "JSON(status UInt16)", json_paths={"user.id": "String"}))
+        assert diff_schemas(fields, new) == {("doc", "user.id")}
+
+    def test_path_alias_added(self, fields):
+        new = dict(fields, payload=Field("payload", True, "String", path_aliases=[PathAlias("user:id", "uid", "Int64")]))
+        assert diff_schemas(fields, new) == {("payload", "user:id")}
+
+    def test_json_typed_path_change(self, fields):
+        new = dict(fields, doc=Field("doc", False, "JSON(status UInt32)", json_paths={"user.id": "Int64"}))
+        assert diff_schemas(fields, new) == {("doc", "status")}
+
+
+class TestImpactIndex:
+
+    def test_compile_returns_sql(self, fields):
+        index = ImpactIndex()
+        assert index.compile("q", leaf("message"), fields) == "message = 'x'"
+        assert index.references("q") == {("message", None)}
+
+    def test_dropped_field(self, fields, index):
+        new = dict(fields)
+        del new["message"]
+        assert index.affected_by_schema_change(fields, new) == {"q_message", "q_attrs"}
+
+    def test_path_change_affects_only_path(self, fields, index):
+        new = dict(fields, doc=Field("doc", False, "JSON(status UInt16)", json_paths={"user.id": "String"}))
+        assert index.affected_by_schema_change(fields, new) == {"q_doc_user"}
+
+    def test_path_alias_affects_only_path(self, fields, index):
+        new = dict(fields, payload=Field("payload", True, "String", path_aliases=[PathAlias("user:id", "uid", "Int64")]))
+        index.compile("q_payload_other", leaf("payload:user:name"), fields)
+        assert index.affected_by_schema_change(fields, new) == {"q_payload"}
+
+    def test_path_prefix_change(self, index):
+        assert index.affected([("payload", "user")]) == {"q_payload"}
+        assert index.affected([("payload", "use")]) == set()
+
+    def test_recompile_replaces_references(self, fields, index):
+        index.compile("q_message", leaf("attrs:env"), fields)
+        assert index.affected([("message", None)]) == {"q_attrs"}
+        assert len(index) == 5
+
+    def test_remove(self, index):
+        index.remove("q_attrs")
+        assert index.affected([("attrs", None)]) == set()
+        assert len(index) == 4
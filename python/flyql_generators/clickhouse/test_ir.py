@@ -0,0 +1,128 @@
+import pickle
+
+import pytest
+from flyql.exceptions import FlyqlError
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+
+from . import generator
+from .field import Field, PathAlias
+from .generator import expression_to_ir, to_ir, to_sql
+from .ir import (
+    STRATEGY_ARRAY,
+    STRATEGY_COLUMN,
+    STRATEGY_JSON_DYNAMIC,
+    STRATEGY_JSON_HINTED,
+    STRATEGY_JSON_STRING,
+    STRATEGY_JSON_TYPED,
+    STRATEGY_MAP,
+    STRATEGY_PATH_ALIAS,
+    Bool,
+    Column,
+    Compare,
+    Literal,
+    Predicate,
+)
+from .memo import CompileCache
+from .render import render_where
+from .testing import leaf
+
+
+@pytest.fixture
+def fields(fields):
+    return dict(
+        fields,
+        payload=Field("payload", True, "String", path_aliases=[PathAlias("user:id", "user_id", "Int64")]),
+        attrs=Field("attrs", False, "Map(String, String)", map_keys_indexed=True),
+    )
+
+
+@pytest.mark.parametrize("key,value,strategy", [
+    ("message", "hello", STRATEGY_COLUMN),
+    ("payload:user:id", "1", STRATEGY_PATH_ALIAS),
+    ("payload:user:name", "bob", STRATEGY_JSON_STRING),
+    ("doc:status", "1", STRATEGY_JSON_TYPED),
+    ("doc:user:id", "1", STRATEGY_JSON_HINTED),
+    ("doc:d", "x", STRATEGY_JSON_DYNAMIC),
+    ("attrs:env", "prod", STRATEGY_MAP),
+    ("tags:0", "a", STRATEGY_ARRAY),
+])
+def test_access_strategy(fields, key, value, strategy):
+    predicate = expression_to_ir(Expression(key, Operator.EQUALS.value, value, True), fields)
+    assert predicate.strategy == strategy
+    assert predicate.key == key
+    assert predicate.field == key.split(":")[0]
+    assert predicate.path == tuple(key.split(":")[1:])
+
+
+def test_resolved_literals(fields):
+    predicate = expression_to_ir(Expression("doc:status", Operator.GREATER_THAN.value, "10", True), fields)
+    assert predicate.condition == Compare(Column("doc.status"), ">", Literal(10, "10", "Int64"))
+
+
+def test_plain_tree_structure(fields):
+    root = Node("and", None, leaf("message", Operator.EQUALS.value, "a"), leaf("count", Operator.GREATER_THAN.value, 1, False))
+    result = to_ir(root, fields)
+    assert isinstance(result, Bool)
+    assert result.operator == "and"
+    assert all(isinstance(x, Predicate) for x in result.operands)
+
+
+def test_empty_tree(fields):
+    assert to_ir(Node("and", None, None, None), fields) is None
+
+
+def test_value_equality(fields):
+    root = leaf("attrs:env", Operator.EQUALS.value, "prod")
+    assert to_ir(root, fields) == to_ir(root, fields)
+    assert hash(to_ir(root, fields)) == hash(to_ir(root, fields))
+    assert to_ir(root, fields) != to_ir(leaf("attrs:env", Operator.EQUALS.value, "dev"), fields)
+
+
+def test_pickle_round_trip(fields):
+    left = leaf("payload:user:name", Operator.NOT_EQUALS_REGEX.value, "^a")
+    right = leaf("attrs:env", Operator.EQUALS.value, "prod")
+    result = to_ir(Node("or", None, left, right), fields, canonical=True)
+    restored = pickle.loads(pickle.dumps(result))
+    assert restored == result
+    assert render_where(restored) == to_sql(Node("or", None, left, right), fields, canonical=True)
+
+
+def test_nodes_immutable(fields):
+    root = Node("and", None, leaf("message", Operator.EQUALS.value, "a"), leaf("attrs:env", Operator.EQUALS.value, "b"))
+    result = to_ir(root, fields)
+    with pytest.raises(AttributeError):
+        result.operands = ()
+    with pytest.raises(AttributeError):
+        result.operands[0].condition.right.text = "'x'"
+    with pytest.raises(AttributeError):
+        del result.operator
+    with pytest.raises(AttributeError):
+        result.extra = 1
+
+
+def test_validation_happens_once(fields, monkeypatch):
+    result = to_ir(leaf("count", Operator.GREATER_THAN.value, 5, False), fields)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("validated again")
+
+    monkeypatch.setattr(generator, "validate_operation", fail)
+    assert render_where(result) == "count > 5.0"
+    with pytest.raises(AssertionError):
+        to_ir(leaf("count", Operator.GREATER_THAN.value, 5, False), fields)
+
+
+def test_errors_raised_while_compiling(fields):
+    with pytest.raises(FlyqlError):
+        to_ir(leaf("unknown", Operator.EQUALS.value, "a"), fields)
+
+
+def test_cache_stores_ir(fields):
+    cache = CompileCache()
+    root = Node("and", None, leaf("message", Operator.EQUALS.value, "a"), leaf("tags:0", Operator.EQUALS.value, "b"))
+    first = to_ir(root, fields, cache=cache)
+    second = to_ir(root, fields, cache=cache)
+    assert second is first
+    assert cache.hits == 1
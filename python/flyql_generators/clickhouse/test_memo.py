@@ -0,0 +1,149 @@
+import pytest
+from flyql.exceptions import FlyqlError
+from flyql.constants import Operator
+from .field import Field
+from .generator import to_ir, to_sql
+from .helpers import build_chain
+from .memo import CompileCache, SubtreeKeys, shared_cache
+from .testing import leaf
+
+
+def messages(count):
+    return [leaf("message", Operator.EQUALS.value, f"m{i}") for i in range(count)]
+
+
+class TestCompileCache:
+
+    def test_get_put(self):
+        cache = CompileCache()
+        assert cache.get(1) is None
+        cache.put(1, "x = 1")
+        assert cache.get(1) == "x = 1"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_lru_eviction(self):
+        cache = CompileCache(maxsize=2, shards=1)
+        cache.put(1, "a")
+        cache.put(2, "b")
+        cache.get(1)
+        cache.put(3, "c")
+        assert len(cache) == 2
+        assert cache.get(2) is None
+        assert cache.get(1) == "a"
+        assert cache.get(3) == "c"
+
+    def test_clear(self):
+        cache = CompileCache()
+        cache.put(1, "a")
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_sharded_size_bound(self):
+        cache = CompileCache(maxsize=100, shards=8)
+        for i in range(1000):
+            cache.put(i, str(i))
+        assert len(cache) == 100
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            CompileCache(maxsize=0)
+        with pytest.raises(ValueError):
+            CompileCache(shards=0)
+
+    def test_shared_cache(self):
+        assert isinstance(shared_cache, CompileCache)
+
+
+class TestSubtreeKeys:
+
+    def test_structurally_equal_trees(self, fields):
+        cache = CompileCache()
+        first = build_chain("and", messages(3))
+        second = build_chain("and", messages(3))
+        assert SubtreeKeys(cache, fields, "plain").key(first) == SubtreeKeys(cache, fields, "plain").key(second)
+
+    def test_value_type_matters(self, fields):
+        cache = CompileCache()
+        keys = SubtreeKeys(cache, fields, "plain")
+        assert keys.key(leaf("count", Operator.EQUALS.value, "1")) != keys.key(leaf("count", Operator.EQUALS.value, 1.0, False))
+
+    def test_field_change_changes_key(self, fields):
+        cache = CompileCache()
+        node = leaf("message", Operator.EQUALS.value, "a")
+        changed = dict(fields, message=Field("message", False, "LowCardinality(String)"))
+        assert SubtreeKeys(cache, fields, "plain").key(node) != SubtreeKeys(cache, changed, "plain").key(node)
+
+    def test_mode_changes_key(self, fields):
+        cache = CompileCache()
+        node = leaf("message", Operator.EQUALS.value, "a")
+        assert SubtreeKeys(cache, fields, "plain").key(node) != SubtreeKeys(cache, fields, "canonical").key(node)
+
+    def test_field_key_computed_once(self, fields, monkeypatch):
+        calls = []
+        cache_key = Field.cache_key
+        monkeypatch.setattr(Field, "cache_key", lambda self: calls.append(self.name) or cache_key(self))
+        root = build_chain("and", messages(200) + [leaf("count", Operator.GREATER_THAN.value, 5, False)])
+        SubtreeKeys(CompileCache(), fields, "plain").key(root)
+        assert sorted(calls) == ["count", "message"]
+
+
+class TestCachedToSQL:
+
+    def test_same_output(self, fields):
+        cache = CompileCache()
+        root = build_chain("or", messages(5))
+        expected = to_sql(root, fields)
+        assert to_sql(root, fields, cache=cache) == expected
+        assert to_sql(root, fields, cache=cache) == expected
+        assert cache.hits == 1
+
+    def test_edit_recompiles_changed_path_only(self, fields):
+        cache = CompileCache()
+        operands = messages(200)
+        to_sql(build_chain("and", operands), fields, cache=cache)
+
+        edited = build_chain("and", operands[:-1] + [leaf("count", Operator.GREATER_THAN.value, 5, False)])
+        misses = cache.misses
+        result = to_sql(edited, fields, cache=cache)
+        # new root and new leaf, the untouched 199-operand subtree is reused
+        assert cache.misses - misses == 2
+        assert result == to_sql(edited, fields)
+
+    @pytest.mark.parametrize("index", [1, 100, 199])
+    def test_edit_misses_path_to_root(self, fields, index):
+        cache = CompileCache()
+        operands = messages(200)
+        to_sql(build_chain("and", operands), fields, cache=cache)
+
+        operands[index] = leaf("count", Operator.GREATER_THAN.value, 5, False)
+        misses = cache.misses
+        to_sql(build_chain("and", operands), fields, cache=cache)
+        # operand index is joined by chain node index, which has 199 - index ancestors
+        assert cache.misses - misses == 1 + (200 - index)
+
+    def test_canonical_mode_cached_separately(self, fields):
+        cache = CompileCache()
+        root = build_chain("and", [leaf("count", Operator.GREATER_THAN.value, 5, False), messages(1)[0]])
+        assert to_sql(root, fields, cache=cache) == "(count > 5.0 and message = 'm0')"
+        assert to_sql(root, fields, canonical=True, cache=cache) == "(count > 5 and message = 'm0')"
+
+    def test_root_hit_returns_cached_text(self, fields):
+        cache = CompileCache()
+        root = build_chain("or", messages(5))
+        first = to_sql(root, fields, cache=cache)
+        assert to_sql(root, fields, cache=cache) is first
+
+    def test_text_and_ir_cached_separately(self, fields):
+        cache = CompileCache()
+        root = build_chain("or", messages(5))
+        text = to_sql(root, fields, cache=cache)
+        result = to_ir(root, fields, cache=cache)
+        assert not isinstance(result, str)
+        assert to_sql(root, fields, cache=cache) == text
+
+    def test_errors_not_cached(self, fields):
+        cache = CompileCache()
+        node = leaf("enum_field", Operator.EQUALS.value, "invalid")
+        with pytest.raises(FlyqlError, match="unknown value"):
+            to_sql(node, fields, cache=cache)
+        assert len(cache) == 0
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flyql.exceptions import FlyqlError
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+from . import planner
+from .planner import (
+    datetime_to_sql,
+    plan_time_slices,
+    progressive_search,
+    time_windows,
+)
+
+
+@pytest.fixture
+def root():
+    return Node("", Expression("message", Operator.EQUALS.value, "timeout*", True), None, None)
+
+
+END = datetime(2024, 1, 8)
+START = END - timedelta(days=7)
+
+
+class TestTimeWindows:
+
+    def test_geometric_newest_first(self):
+        windows = list(time_windows(END - timedelta(minutes=20), END, timedelta(minutes=2), 2))
+        assert windows == [
+            (END - timedelta(minutes=2), END),
+            (END - timedelta(minutes=6), END - timedelta(minutes=2)),
+            (END - timedelta(minutes=14), END - timedelta(minutes=6)),
+            (END - timedelta(minutes=20), END - timedelta(minutes=14)),
+        ]
+
+    def test_windows_cover_range(self):
+        windows = list(time_windows(START, END, timedelta(seconds=7), 3))
+        assert windows[0][1] == END
+        assert windows[-1][0] == START
+        for newer, older in zip(windows, windows[1:]):
+            assert older[1] == newer[0]
+
+    def test_max_window(self):
+        windows = list(time_windows(START, END, timedelta(days=1), 4, max_window=timedelta(days=2)))
+        assert [x[1] - x[0] for x in windows] == [timedelta(days=1)] + [timedelta(days=2)] * 3
+
+    @pytest.mark.parametrize("start,end,window,growth,max_window", [
+        (END, START, timedelta(minutes=1), 2, None),
+        (START, END, timedelta(0), 2, None),
+        (START, END, timedelta(minutes=1), 0.5, None),
+        (START, END, timedelta(minutes=1), 2, timedelta(0)),
+        (START, END, timedelta(minutes=1), 2, timedelta(days=-1)),
+    ])
+    def test_invalid(self, start, end, window, growth, max_window):
+        with pytest.raises(FlyqlError):
+            list(time_windows(start, end, window, growth, max_window))
+
+
+class TestPlanTimeSlices:
+
+    def test_queries(self, fields, root):
+        slices = list(plan_time_slices(root, fields, fields["ts"], END - timedelta(minutes=3), END, timedelta(minutes=1)))
+        assert [x.where for x in slices] == [
+            "message LIKE 'timeout%' and ts >= toDateTime64('2024-01-07 23:59:00.000000', 6)"
+            " and ts < toDateTime64('2024-01-08 00:00:00.000000', 6)",
+            "message LIKE 'timeout%' and ts >= toDateTime64('2024-01-07 23:57:00.000000', 6)"
+            " and ts < toDateTime64('2024-01-07 23:59:00.000000', 6)",
+        ]
+
+    def test_filter_compiled_once(self, fields, root, monkeypatch):
+        calls = []
+        original = planner.to_sql
+
+        def counting_to_sql(**kwargs):
+            calls.append(kwargs)
+            return original(**kwargs)
+
+        monkeypatch.setattr(planner, "to_sql", counting_to_sql)
+        slices = list(plan_time_slices(root, fields, fields["ts"], START, END))
+        assert len(slices) > 1
+        assert len(calls) == 1
+
+    def test_no_filter(self, fields):
+        slices = list(plan_time_slices(None, fields, fields["ts"], END - timedelta(minutes=1), END))
+        assert slices[0].where.startswith("ts >= ")
+
+    def test_time_field_must_be_date(self, fields, root):
+        with pytest.raises(FlyqlError, match="time field must have date type"):
+            list(plan_time_slices(root, fields, fields["message"], START, END))
+
+    def test_aware_datetime_in_utc(self):
+        value = datetime(2024, 1, 1, 3, 0, tzinfo=timezone(timedelta(hours=3)))
+        assert datetime_to_sql(value) == "toDateTime64('2024-01-01 00:00:00.000000', 6, 'UTC')"
+
+
+class FakeExecutor:
+
+    def __init__(self, rows_per_window):
+        self.rows_per_window = rows_per_window
+        self.calls = []
+
+    def __call__(self, time_slice, limit):
+        self.calls.append((time_slice, limit))
+        return [f"{time_slice.end:%H:%M}#{i}" for i in range(min(limit, self.rows_per_window))]
+
+
+class TestProgressiveSearch:
+
+    def test_stops_when_enough_rows(self, fields, root):
+        executor = FakeExecutor(rows_per_window=40)
+        slices = plan_time_slices(root, fields, fields["ts"], START, END, timedelta(minutes=1))
+        rows = progressive_search(slices, executor, limit=100)
+        assert len(rows) == 100
+        assert len(executor.calls) == 3
+        assert [x[1] for x in executor.calls] == [100, 60, 20]
+        assert rows[0] == "00:00#0"
+
+    def test_exhausts_range(self, fields, root):
+        executor = FakeExecutor(rows_per_window=1)
+        slices = list(plan_time_slices(root, fields, fields["ts"], END - timedelta(minutes=7), END, timedelta(minutes=1)))
+        rows = progressive_search(slices, executor, limit=100)
+        assert len(rows) == len(slices) == 3
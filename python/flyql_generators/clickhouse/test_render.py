@@ -0,0 +1,106 @@
+import pytest
+from flyql.constants import Operator
+from flyql.tree import Node
+
+from .field import Field
+from .generator import to_ir, to_sql, to_sql_with_aliases
+from .render import render_debug, render_parameterized, render_where, render_with_aliases
+from .testing import leaf
+
+
+@pytest.fixture
+def fields(fields):
+    return dict(fields, attrs=Field("attrs", False, "Map(String, String)", map_keys_indexed=True))
+
+
+@pytest.fixture
+def root():
+    return Node(
+        "or",
+        None,
+        Node("and", None, leaf("message", Operator.EQUALS.value, "err*"), leaf("attrs:env", Operator.EQUALS.value, "prod")),
+        Node("and", None, leaf("doc:status", Operator.GREATER_THAN.value, "3"), leaf("payload:level", Operator.EQUALS.value, "it's")),
+    )
+
+
+def test_where_matches_to_sql(fields, root):
+    assert render_where(to_ir(root, fields)) == to_sql(root, fields)
+    assert render_where(to_ir(root, fields, canonical=True)) == to_sql(root, fields, canonical=True)
+
+
+@pytest.mark.parametrize("key, operator, value", [
+    ("payload:user:id", Operator.EQUALS.value, 42),
+    ("payload:level", Operator.NOT_EQUALS_REGEX.value, "^x"),
+    ("doc:status", Operator.NOT_EQUALS.value, 3),
+    ("doc:user:id", Operator.EQUALS_REGEX.value, "1.*"),
+    ("tags:0", Operator.NOT_EQUALS_REGEX.value, "a"),
+    ("attrs:env", Operator.EQUALS.value, "prod"),
+    ("message", Operator.NOT_EQUALS.value, "*a*"),
+])
+def test_where_matches_to_sql_per_strategy(fields, key, operator, value):
+    root = Node("and", None, leaf(key, operator, value), leaf("count", Operator.LOWER_THAN.value, 5))
+    assert render_where(to_ir(root, fields)) == to_sql(root, fields)
+    assert render_where(to_ir(root, fields, canonical=True)) == to_sql(root, fields, canonical=True)
+
+
+def test_where_empty():
+    assert render_where(None) == ""
+    assert render_parameterized(None) == ("", {})
+    assert render_with_aliases(None) == ("", "")
+
+
+def test_parameterized(fields, root):
+    text, params = render_parameterized(to_ir(root, fields))
+    assert text == (
+        "((message LIKE {p0:String} and (mapContains(attrs, {p1:String}) and equals(attrs[{p2:String}], {p3:String}))) or "
+        "(doc.status > {p4:Int64} and multiIf(JSONType(payload, {p5:String}) = 'String', "
+        "equals(JSONExtractString(payload, {p6:String}), {p7:String}),0)))"
+    )
+    assert params == {
+        "p0": "err%",
+        "p1": "env",
+        "p2": "env",
+        "p3": "prod",
+        "p4": 3,
+        "p5": "level",
+        "p6": "level",
+        "p7": "it's",
+    }
+
+
+def test_parameterized_numbers(fields):
+    text, params = render_parameterized(to_ir(leaf("count", Operator.GREATER_THAN.value, 2.5, False), fields))
+    assert text == "count > {p0:Float64}"
+    assert params == {"p0": 2.5}
+
+
+def test_debug(fields):
+    root = Node("and", None, leaf("message", Operator.EQUALS.value, "a"), leaf("attrs:env", Operator.NOT_EQUALS.value, "b"))
+    assert render_debug(to_ir(root, fields)) == (
+        "(/* column message = */ message = 'a' and "
+        "/* map attrs:env != */ notEquals(attrs['env'], 'b'))"
+    )
+
+
+@pytest.mark.parametrize("key", ["attrs:x*/ or 1=1 /*", "attrs:x/*/", "attrs:**/"])
+def test_debug_key_can_not_close_comment(fields, key):
+    text = render_debug(to_ir(leaf(key, Operator.EQUALS.value, "b"), fields))
+    tag, _, condition = text[len("/*"):].partition("*/")
+    assert "/*" not in tag
+    assert condition.strip() == to_sql(leaf(key, Operator.EQUALS.value, "b"), fields)
+
+
+def test_with_aliases_matches_generator(fields, root):
+    twice = Node("or", None, root, leaf("attrs:env", Operator.EQUALS_REGEX.value, "p.*"))
+    with_clause, text = render_with_aliases(to_ir(twice, fields))
+    assert (with_clause, text) == to_sql_with_aliases(twice, fields)
+    assert with_clause == "WITH attrs['env'] AS _fq_0"
+
+
+def test_render_many_forms_from_one_ir(fields, root):
+    result = to_ir(root, fields)
+    where = render_where(result)
+    render_parameterized(result)
+    render_debug(result)
+    render_with_aliases(result)
+    assert render_where(result) == where
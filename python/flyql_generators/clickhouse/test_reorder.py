@@ -0,0 +1,89 @@
+from flyql.constants import Operator
+from flyql.tree import Node
+from .generator import to_sql
+from .helpers import flatten
+from .reorder import reorder
+from .testing import leaf
+
+
+def chain(bool_operator, *nodes):
+    root = nodes[0]
+    for node in nodes[1:]:
+        root = Node(bool_operator, None, root, node)
+    return root
+
+
+class TestReorder:
+
+    def test_regex_moves_after_equality(self, fields):
+        root = chain(
+            "and",
+            leaf("message", Operator.EQUALS_REGEX.value, "timeout"),
+            leaf("service", Operator.EQUALS.value, "api"),
+        )
+        result = to_sql(reorder(root, fields), fields)
+        assert result == "(service = 'api' and match(message, 'timeout'))"
+
+    def test_cost_ranking(self, fields):
+        root = chain(
+            "and",
+            leaf("message", Operator.EQUALS_REGEX.value, "x"),
+            leaf("payload:user:id", Operator.EQUALS.value, "1"),
+            leaf("message", Operator.EQUALS.value, "*err*"),
+            leaf("attrs:env", Operator.EQUALS.value, "prod"),
+            leaf("count", Operator.GREATER_THAN.value, 1, False),
+        )
+        operands = flatten(reorder(root, fields), "and")
+        assert [x.expression.key for x in operands] == [
+            "count", "attrs:env", "message", "payload:user:id", "message",
+        ]
+        assert operands[-1].expression.operator == Operator.EQUALS_REGEX.value
+
+    def test_equal_cost_keeps_user_order(self, fields):
+        root = chain(
+            "or",
+            leaf("service", Operator.EQUALS.value, "b"),
+            leaf("service", Operator.EQUALS.value, "a"),
+        )
+        result = to_sql(reorder(root, fields), fields)
+        assert result == "(service = 'b' or service = 'a')"
+
+    def test_selectivity_and(self, fields):
+        root = chain(
+            "and",
+            leaf("service", Operator.EQUALS.value, "api"),
+            leaf("count", Operator.EQUALS.value, 1, False),
+        )
+        result = to_sql(reorder(root, fields, {"service": 0.9, "count": 0.01}), fields)
+        assert result == "(count = '1.0' and service = 'api')"
+
+    def test_selectivity_or(self, fields):
+        root = chain(
+            "or",
+            leaf("service", Operator.EQUALS.value, "api"),
+            leaf("count", Operator.EQUALS.value, 1, False),
+        )
+        result = to_sql(reorder(root, fields, {"service": 0.01, "count": 0.9}), fields)
+        assert result == "(count = '1.0' or service = 'api')"
+
+    def test_nested_groups_ranked_by_expected_cost(self, fields):
+        expensive = chain(
+            "or",
+            leaf("message", Operator.EQUALS_REGEX.value, "a"),
+            leaf("message", Operator.EQUALS_REGEX.value, "b"),
+        )
+        cheap = leaf("service", Operator.EQUALS.value, "api")
+        result = to_sql(reorder(chain("and", expensive, cheap), fields), fields)
+        assert result == "(service = 'api' and (match(message, 'a') or match(message, 'b')))"
+
+    def test_input_tree_not_modified(self, fields):
+        regex = leaf("message", Operator.EQUALS_REGEX.value, "timeout")
+        equals = leaf("service", Operator.EQUALS.value, "api")
+        root = chain("and", regex, equals)
+        reorder(root, fields)
+        assert root.left is regex
+        assert root.right is equals
+
+    def test_single_expression(self, fields):
+        root = leaf("service", Operator.EQUALS.value, "api")
+        assert reorder(root, fields) is root
@@ -0,0 +1,135 @@
+import pytest
+from flyql.exceptions import FlyqlError
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+from .field import Field, PathAlias
+from .generator import to_sql
+from .stats import (
+    SHAPE_EXACT,
+    SHAPE_INFIX,
+    SHAPE_PATTERN,
+    SHAPE_PREFIX,
+    SHAPE_RANGE,
+    SHAPE_REGEX,
+    SHAPE_SUFFIX,
+    WorkloadStats,
+    pattern_shape,
+    recommend,
+)
+from .testing import leaf
+
+
+@pytest.mark.parametrize("key,operator,value,expected", [
+    ("message", Operator.EQUALS.value, "error", SHAPE_EXACT),
+    ("message", Operator.EQUALS.value, "error*", SHAPE_PREFIX),
+    ("message", Operator.NOT_EQUALS.value, "*error", SHAPE_SUFFIX),
+    ("message", Operator.EQUALS.value, "*error*", SHAPE_INFIX),
+    ("message", Operator.EQUALS.value, "a*b", SHAPE_PATTERN),
+    ("message", Operator.EQUALS.value, "100%", SHAPE_EXACT),
+    ("message", Operator.EQUALS_REGEX.value, "err.*", SHAPE_REGEX),
+    ("duration", Operator.GREATER_THAN.value, 1.5, SHAPE_RANGE),
+    ("attrs:env", Operator.EQUALS.value, "prod*", SHAPE_EXACT),
+])
+def test_pattern_shape(fields, key, operator, value, expected):
+    expression = Expression(key, operator, value, isinstance(value, str))
+    assert pattern_shape(expression, fields.get(key.split(":")[0])) == expected
+
+
+class TestWorkloadStats:
+
+    def test_record_via_to_sql(self, fields):
+        stats = WorkloadStats()
+        root = Node("or", None, leaf("level", Operator.EQUALS.value, "error"), leaf("level", Operator.EQUALS.value, "warn"))
+        to_sql(root, fields, stats=stats)
+        to_sql(leaf("level", Operator.EQUALS.value, "error"), fields, stats=stats)
+        items = dict(stats.items())
+        item = items[("level", None, Operator.EQUALS.value, SHAPE_EXACT)]
+        assert item.count == 3
+        assert item.cardinality == 2
+
+    def test_failed_compilation_not_recorded(self, fields):
+        stats = WorkloadStats()
+        with pytest.raises(FlyqlError):
+            to_sql(leaf("unknown", Operator.EQUALS.value, "x"), fields, stats=stats)
+        assert len(stats) == 0
+
+    def test_paths_recorded(self, fields):
+        stats = WorkloadStats()
+        stats.record(leaf("payload:user:id", Operator.EQUALS.value, 1), fields)
+        assert [x[0] for x in stats.items()] == [("payload", "user:id", Operator.EQUALS.value, SHAPE_EXACT)]
+
+    def test_max_keys(self, fields):
+        stats = WorkloadStats(max_keys=1)
+        stats.record(leaf("message", Operator.EQUALS.value, "a"), fields)
+        stats.record(leaf("trace_id", Operator.EQUALS.value, "a"), fields)
+        stats.record(leaf("message", Operator.EQUALS.value, "b"), fields)
+        assert len(stats) == 1
+        assert stats.dropped == 1
+        assert stats.items()[0][1].count == 2
+
+    def test_max_values(self, fields):
+        stats = WorkloadStats(max_values=2)
+        for value in ["a", "b", "c", "a"]:
+            stats.record(leaf("message", Operator.EQUALS.value, value), fields)
+        item = stats.items()[0][1]
+        assert item.cardinality == 2
+        assert item.values_saturated is True
+        assert item.count == 4
+
+    def test_clear(self, fields):
+        stats = WorkloadStats()
+        stats.record(leaf("message", Operator.EQUALS.value, "a"), fields)
+        stats.clear()
+        assert len(stats) == 0
+
+
+class TestRecommend:
+
+    def test_recommendations(self, fields):
+        stats = WorkloadStats(max_values=300)
+        for i in range(3):
+            stats.record(leaf("level", Operator.EQUALS.value, ["error", "warn"][i % 2]), fields)
+        for i in range(300):
+            stats.record(leaf("trace_id", Operator.EQUALS.value, f"t{i}"), fields)
+        stats.record(leaf("message", Operator.EQUALS.value, "*timeout*"), fields)
+        stats.record(leaf("message", Operator.EQUALS_REGEX.value, "time.*out"), fields)
+        stats.record(leaf("duration", Operator.GREATER_THAN.value, 1.5), fields)
+        for _ in range(5):
+            stats.record(leaf("payload:http:status", Operator.EQUALS.value, 500), fields)
+        stats.record(leaf("attrs:env", Operator.EQUALS.value, "prod"), fields)
+        stats.record(leaf("attrs:region", Operator.EQUALS_REGEX.value, "eu.*"), fields)
+
+        result = {x.ddl: x for x in recommend(stats, fields)}
+        assert set(result) == {
+            "INDEX idx_trace_id_bloom_filter trace_id TYPE bloom_filter GRANULARITY 4",
+            "ADD COLUMN payload_http_status Int64 MATERIALIZED JSONExtractInt(payload, 'http', 'status')",
+            "INDEX idx_level_set level TYPE set(256) GRANULARITY 4",
+            "INDEX idx_attrs_mapkeys_attrs_bloom_filter mapKeys(attrs) TYPE bloom_filter GRANULARITY 4",
+            "INDEX idx_attrs_mapvalues_attrs_bloom_filter mapValues(attrs) TYPE bloom_filter GRANULARITY 4",
+            "INDEX idx_message_ngrambf_v1 message TYPE ngrambf_v1(3, 256, 2, 0) GRANULARITY 4",
+            "INDEX idx_message_tokenbf_v1 message TYPE tokenbf_v1(256, 2, 0) GRANULARITY 4",
+            "INDEX idx_duration_minmax duration TYPE minmax GRANULARITY 4",
+        }
+        ordered = recommend(stats, fields)
+        assert ordered[0].expression == "trace_id"
+        assert ordered[1].kind == "materialized_column"
+        assert result["INDEX idx_attrs_mapkeys_attrs_bloom_filter mapKeys(attrs) TYPE bloom_filter GRANULARITY 4"].count == 2
+
+    def test_string_json_path(self, fields):
+        stats = WorkloadStats()
+        stats.record(leaf("payload:user:name", Operator.EQUALS.value, "bob"), fields)
+        assert recommend(stats, fields)[0].ddl == (
+            "ADD COLUMN payload_user_name String MATERIALIZED JSONExtractString(payload, 'user', 'name')"
+        )
+
+    def test_min_count(self, fields):
+        stats = WorkloadStats()
+        stats.record(leaf("message", Operator.EQUALS.value, "a"), fields)
+        assert recommend(stats, fields, min_count=2) == []
+
+    def test_aliased_path_skipped(self, fields):
+        stats = WorkloadStats()
+        stats.record(leaf("payload:user:id", Operator.EQUALS.value, 1), fields)
+        aliased = dict(fields, payload=Field("payload", True, "String", path_aliases=[PathAlias("user:id", "uid", "Int64")]))
+        assert recommend(stats, aliased) == []
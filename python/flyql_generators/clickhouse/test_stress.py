@@ -0,0 +1,38 @@
+from .memo import CompileCache
+from .stats import WorkloadStats
+from .generator import to_sql
+from .stress import (
+    build_workload,
+    compile_tree,
+    run_threads,
+    scaling_report,
+    stress_fields,
+)
+
+
+def test_build_workload_reproducible():
+    fields = stress_fields()
+    first = [to_sql(x, fields) for x in build_workload(20, seed=1)]
+    second = [to_sql(x, fields) for x in build_workload(20, seed=1)]
+    assert first == second
+
+
+def test_concurrent_compilation_deterministic():
+    fields = stress_fields()
+    workload = build_workload(50, seed=2)
+    reference = [compile_tree(x, fields) for x in workload]
+    cache = CompileCache(maxsize=64)
+    stats = WorkloadStats()
+    result = run_threads(8, workload, fields, reference, iterations=3, cache=cache, stats=stats)
+    assert result.errors == []
+    assert result.mismatches == 0
+    assert result.compiled == 8 * 3 * 50
+    assert cache.hits > 0
+    assert sum(x[1].count for x in stats.items()) > 0
+
+
+def test_scaling_report():
+    rows = scaling_report(thread_counts=(1, 2), workload_size=10, iterations=1)
+    assert [x["threads"] for x in rows] == [1, 2]
+    assert rows[0]["speedup"] == 1.0
+    assert all(x["throughput"] > 0 and x["efficiency"] > 0 for x in rows)
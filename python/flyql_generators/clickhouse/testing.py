@@ -0,0 +1,15 @@
+from typing import Optional
+
+from flyql.expression import Expression
+from flyql.constants import Operator
+from flyql.tree import Node
+
+
+def leaf(key: str, operator: str = Operator.EQUALS.value, value="x", value_is_string: Optional[bool] = None) -> Node:
+    """
+    Returns tree node holding a single expression, value_is_string
+    defaults to whether value is a string
+    """
+    if value_is_string is None:
+        value_is_string = isinstance(value, str)
+    return Node("", Expression(key, operator, value, value_is_string), None, None)